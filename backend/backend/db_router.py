@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .metrics import registry
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'db_primary'
+PIN_KEY = 'db_primary:{marker}'
+
+current_state = ContextVar('db_routing_state', default=None)
+
+
+def pin_key(request):
+    header = request.headers.get('Authorization')
+    if not header:
+        return None
+    return PIN_KEY.format(
+        marker=hashlib.sha256(header.encode()).hexdigest())
+
+
+class RoutingState:
+    def __init__(self, request):
+        self.request = request
+        self.wrote = request.method not in SAFE_METHODS
+        self.pinned = None
+
+    def is_pinned(self):
+        if self.wrote:
+            return True
+        if self.pinned is None:
+            key = pin_key(self.request)
+            self.pinned = PIN_COOKIE in self.request.COOKIES or (
+                key is not None and caches['state'].get(key) is not None)
+        return self.pinned
+
+    def is_replicated(self):
+        match = self.request.resolver_match
+        view_class = getattr(match.func, 'cls', None) if match else None
+        return getattr(view_class, 'read_from_replica', False)
+
+
+class ReplicaRouter:
+    """Чтения из представлений с read_from_replica уходят на реплики.
+    Запросы с записью, чтения в транзакции и чтения клиента в течение
+    REPLICA_PIN_SECONDS после его записи идут в основную базу. Отметки
+    о записи хранятся в кеше 'state' без вытеснения."""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return None
+        state = current_state.get()
+        alias = DEFAULT_DB_ALIAS
+        if state is None:
+            reason = 'no_request'
+        elif not state.is_replicated():
+            reason = 'not_replicated'
+        elif state.is_pinned():
+            reason = 'pinned'
+        elif connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            reason = 'transaction'
+        else:
+            alias = random.choice(replicas)
+            reason = 'replica'
+        registry.inc('foodgram_db_reads_total',
+                     (('database', alias), ('reason', reason)))
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = current_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        state = RoutingState(request)
+        token = current_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_state.reset(token)
+        self.pin(request, response, state)
+        return response
+
+    async def acall(self, request):
+        state = RoutingState(request)
+        token = current_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_state.reset(token)
+        await sync_to_async(self.pin, thread_sensitive=False)(
+            request, response, state)
+        return response
+
+    def pin(self, request, response, state):
+        if not state.wrote:
+            return
+        key = pin_key(request)
+        if key is not None:
+            caches['state'].set(key, True, settings.REPLICA_PIN_SECONDS)
+        response.set_cookie(PIN_COOKIE, '1',
+                            max_age=settings.REPLICA_PIN_SECONDS,
+                            httponly=True, samesite='Lax')
+        registry.inc('foodgram_db_pins_total', ())
@@ -0,0 +1,59 @@
+from django.contrib.postgres import operations
+from django.db.migrations import AddConstraint, AddIndex
+
+
+def is_postgresql(schema_editor):
+    return schema_editor.connection.vendor == 'postgresql'
+
+
+class AddIndexConcurrently(operations.AddIndexConcurrently):
+    """CREATE INDEX CONCURRENTLY на PostgreSQL: индекс строится без
+    блокировки записи в таблицу. На остальных СУБД – обычный AddIndex."""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if is_postgresql(schema_editor):
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_forwards(
+            self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if is_postgresql(schema_editor):
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_backwards(
+            self, app_label, schema_editor, from_state, to_state)
+
+
+class AddUniqueConstraintConcurrently(operations.NotInTransactionMixin,
+                                      AddConstraint):
+    """Уникальное ограничение без долгой блокировки таблицы: на PostgreSQL
+    сначала CREATE UNIQUE INDEX CONCURRENTLY, затем ADD CONSTRAINT ... USING
+    INDEX, которому уже не нужно читать таблицу."""
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if not is_postgresql(schema_editor):
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+        self._ensure_not_in_transaction(schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias,
+                                        model):
+            return
+        quote = schema_editor.quote_name
+        table = quote(model._meta.db_table)
+        name = quote(self.constraint.name)
+        columns = ', '.join(
+            quote(model._meta.get_field(field).column)
+            for field in self.constraint.fields
+        )
+        schema_editor.execute(
+            f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON {table} ({columns})')
+        schema_editor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+            f'UNIQUE USING INDEX {name}')
@@ -0,0 +1,368 @@
+import asyncio
+import atexit
+import fcntl
+import hmac
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEAD_WORKERS_FILE = 'dead-workers.json'
+LOCK_FILE = '.lock'
+
+HELP = {
+    'foodgram_http_requests_total': 'Количество обработанных запросов',
+    'foodgram_http_request_duration_seconds': 'Время обработки запроса',
+    'foodgram_http_response_size_bytes': 'Размер ответа',
+    'foodgram_db_queries_per_request': 'Количество SQL-запросов на запрос',
+    'foodgram_db_query_duration_seconds_total': 'Суммарное время SQL',
+    'foodgram_db_reads_total': 'Выбор базы для чтения',
+    'foodgram_db_pins_total': 'Закрепления клиента за основной базой',
+    'foodgram_throttled_requests_total': 'Запросы, отклонённые с 429',
+}
+
+
+class MetricsRegistry:
+    """Счётчики и гистограммы одного процесса. Каждый воркер периодически
+    сбрасывает свой снимок в отдельный файл METRICS_DIR, а эндпоинт
+    метрик складывает снимки всех воркеров."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.flushed_at = 0
+        self.path = None
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[(name, labels)] += value
+
+    def observe(self, name, labels, value, buckets):
+        with self.lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = {
+                    'buckets': list(buckets),
+                    'counts': [0] * (len(buckets) + 1),
+                    'sum': 0,
+                }
+            position = len(buckets)
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    position = index
+                    break
+            histogram['counts'][position] += 1
+            histogram['sum'] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (
+                    name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), dict(
+                    histogram, counts=list(histogram['counts']))]
+                    for (name, labels), histogram in self.histograms.items()],
+            }
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.flushed_at < (
+                settings.METRICS_FLUSH_INTERVAL):
+            return
+        self.flushed_at = now
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.path is None:
+            self.path = directory / f'{os.getpid()}-{time.time_ns()}.json'
+        write_snapshot(self.path, self.snapshot())
+
+
+registry = MetricsRegistry()
+atexit.register(lambda: registry.flush(force=True))
+
+
+def merge_snapshot(counters, histograms, snapshot):
+    for name, labels, value in snapshot['counters']:
+        counters[(name, tuple(map(tuple, labels)))] += value
+    for name, labels, histogram in snapshot['histograms']:
+        key = (name, tuple(map(tuple, labels)))
+        merged = histograms.setdefault(key, {
+            'buckets': histogram['buckets'],
+            'counts': [0] * len(histogram['counts']),
+            'sum': 0,
+        })
+        merged['counts'] = [left + right for left, right in zip(
+            merged['counts'], histogram['counts'])]
+        merged['sum'] += histogram['sum']
+
+
+def read_snapshot(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(path, snapshot):
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps(snapshot))
+    os.replace(temporary, path)
+
+
+def worker_files():
+    """Снимки воркеров по pid. Имя файла – '<pid>-<время запуска>.json'."""
+    files = defaultdict(list)
+    for path in Path(settings.METRICS_DIR).glob('*-*.json'):
+        pid, _, started = path.stem.partition('-')
+        if pid.isdigit() and started.isdigit():
+            files[int(pid)].append((int(started), path))
+    return files
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def to_snapshot(counters, histograms):
+    return {
+        'counters': [[name, list(labels), value]
+                     for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), histogram]
+                       for (name, labels), histogram in histograms.items()],
+    }
+
+
+def mark_process_dead(pid=None):
+    """Переносит снимки завершившихся воркеров в общий файл
+    DEAD_WORKERS_FILE и удаляет их: счётчики не убывают, а число файлов
+    не растёт с каждым перезапуском воркера. Без pid проверяются все
+    воркеры; из нескольких файлов одного pid живым считается только
+    самый новый. Уже перенесённые файлы помечаются в общем файле, чтобы
+    прерванная очистка не учла их дважды."""
+    directory = Path(settings.METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    dead = []
+    for worker, files in worker_files().items():
+        files.sort()
+        if pid is None and is_alive(worker):
+            files = files[:-1]
+        elif pid is not None and worker != pid:
+            continue
+        dead.extend(path for _, path in files
+                    if path != registry.path)
+    if not dead:
+        return
+    with open(directory / LOCK_FILE, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        path = directory / DEAD_WORKERS_FILE
+        archive = read_snapshot(path) or {
+            'counters': [], 'histograms': [], 'merged': []}
+        counters = defaultdict(float)
+        histograms = {}
+        merge_snapshot(counters, histograms, archive)
+        merged = set(archive['merged'])
+        for snapshot_path in dead:
+            if snapshot_path.name in merged:
+                continue
+            snapshot = read_snapshot(snapshot_path)
+            if snapshot is not None:
+                merge_snapshot(counters, histograms, snapshot)
+                merged.add(snapshot_path.name)
+        write_snapshot(path, {
+            **to_snapshot(counters, histograms),
+            'merged': sorted(name for name in merged
+                             if (directory / name).exists()),
+        })
+        for snapshot_path in dead:
+            snapshot_path.unlink(missing_ok=True)
+
+
+def load_snapshots():
+    registry.flush(force=True)
+    mark_process_dead()
+    counters = defaultdict(float)
+    histograms = {}
+    directory = Path(settings.METRICS_DIR)
+    with open(directory / LOCK_FILE, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        merged = set()
+        archive = read_snapshot(directory / DEAD_WORKERS_FILE)
+        if archive is not None:
+            merge_snapshot(counters, histograms, archive)
+            merged = set(archive['merged'])
+        for files in worker_files().values():
+            for _, path in files:
+                snapshot = read_snapshot(path)
+                if snapshot is not None and path.name not in merged:
+                    merge_snapshot(counters, histograms, snapshot)
+    return counters, histograms
+
+
+def format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs)
+    return '{' + escaped + '}'
+
+
+def render_metrics(counters, histograms):
+    lines = []
+    described = set()
+
+    def describe(name, kind):
+        if name not in described:
+            described.add(name)
+            if name in HELP:
+                lines.append(f'# HELP {name} {HELP[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name, 'counter')
+        lines.append(f'{name}{format_labels(labels)} {value:g}')
+    for (name, labels), histogram in sorted(histograms.items()):
+        describe(name, 'histogram')
+        total = 0
+        for bound, count in zip(histogram['buckets'], histogram['counts']):
+            total += count
+            lines.append(f'{name}_bucket'
+                         f'{format_labels(labels, [("le", f"{bound:g}")])}'
+                         f' {total}')
+        total += histogram['counts'][-1]
+        lines.append(f'{name}_bucket'
+                     f'{format_labels(labels, [("le", "+Inf")])} {total}')
+        lines.append(f'{name}_sum{format_labels(labels)} '
+                     f'{histogram["sum"]:g}')
+        lines.append(f'{name}_count{format_labels(labels)} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.count += 1
+        recorder.duration += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Обёртка ставится на каждое соединение, в каком бы потоке оно ни
+    было открыто, а запрос находит свой счётчик через ContextVar: так
+    учитываются и SQL-запросы из пула потоков асинхронных представлений."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        for connection in connections.all():
+            install_query_recorder(sender=None, connection=connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, recorder, started)
+        return response
+
+    async def acall(self, request):
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, recorder, started)
+        return response
+
+    def record(self, request, response, recorder, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        labels = (('route', match.view_name if match else 'unmatched'),
+                  ('method', request.method))
+        registry.inc('foodgram_http_requests_total',
+                     labels + (('status', response.status_code),))
+        registry.observe('foodgram_http_request_duration_seconds', labels,
+                         duration, LATENCY_BUCKETS)
+        registry.observe('foodgram_db_queries_per_request', labels,
+                         recorder.count, QUERY_BUCKETS)
+        registry.inc('foodgram_db_query_duration_seconds_total', labels,
+                     recorder.duration)
+        if not response.streaming:
+            registry.observe('foodgram_http_response_size_bytes', labels,
+                             len(response.content), SIZE_BUCKETS)
+        registry.flush()
+
+
+def extra_metrics():
+    from recipes.fragments import get_stats
+
+    stats = get_stats()
+    return {
+        ('foodgram_recipe_fragment_cache_hits_total', ()): stats['hits'],
+        ('foodgram_recipe_fragment_cache_misses_total', ()): stats['misses'],
+        ('foodgram_recipe_fragment_rebuild_seconds_total', ()):
+            stats['rebuild_ms'] / 1000,
+    }
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    provided = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(provided, f'Bearer {token}'):
+        return HttpResponse(status=403)
+    counters, histograms = load_snapshots()
+    counters.update(extra_metrics())
+    return HttpResponse(render_metrics(counters, histograms),
+                        content_type=CONTENT_TYPE)
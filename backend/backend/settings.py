@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -29,6 +30,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.metrics.MetricsMiddleware',
+    'backend.db_router.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,6 +72,44 @@ DATABASES = {
     }
 }
 
+DATABASE_REPLICAS = []
+
+for number, host in enumerate(os.getenv('DB_REPLICA_HOSTS', '').split(', ')):
+    if host:
+        alias = f'replica_{number}'
+        DATABASES[alias] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['backend.db_router.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+# Два экземпляра Redis. В CACHE_REDIS_URL – то, что можно пересчитать
+# (выгрузки, готовые ответы): он вытесняет старые ключи по LRU.
+# В REDIS_URL – состояние, потеря которого меняет поведение (версии
+# данных): он запускается без вытеснения и с AOF.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://cache:6379')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': f'{CACHE_REDIS_URL}/0',
+    },
+    'state': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': f'{REDIS_URL}/0',
+    },
+    'recipe_fragments': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': f'{CACHE_REDIS_URL}/1',
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -104,20 +145,72 @@ AUTH_USER_MODEL = 'users.FoodgramUser'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+AUTH_MODE = os.getenv('AUTH_MODE', 'token')
+
+AUTHENTICATION_CLASSES = ['recipes.authentication.CachedTokenAuthentication']
+if AUTH_MODE == 'jwt':
+    AUTHENTICATION_CLASSES.insert(
+        0, 'recipes.authentication.FoodgramJWTAuthentication')
+
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ],
+    'DEFAULT_AUTHENTICATION_CLASSES': AUTHENTICATION_CLASSES,
 
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 
-    'DEFAULT_PAGINATION_CLASS': 'recipes.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'recipes.pagination.PageLimitPagination',
     'PAGE_SIZE': 6,
 
+    'DEFAULT_THROTTLE_CLASSES': [
+        'recipes.throttling.UserTokenBucketThrottle',
+        'recipes.throttling.IPTokenBucketThrottle',
+    ],
+    # Число прокси перед приложением: адрес клиента для ограничений по IP
+    # берётся из X-Forwarded-For, который выставляет nginx.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
+    'DEFAULT_THROTTLE_RATES': {
+        'recipe_write': os.getenv('THROTTLE_RECIPE_WRITE', '30/hour'),
+        'recipe_write_ip': os.getenv('THROTTLE_RECIPE_WRITE_IP', '100/hour'),
+        'shopping_cart_download': os.getenv(
+            'THROTTLE_SHOPPING_CART_DOWNLOAD', '20/min'),
+        'shopping_cart_download_ip': os.getenv(
+            'THROTTLE_SHOPPING_CART_DOWNLOAD_IP', '60/min'),
+        'ingredient_search': os.getenv('THROTTLE_INGREDIENT_SEARCH',
+                                       '120/min'),
+        'ingredient_search_ip': os.getenv('THROTTLE_INGREDIENT_SEARCH_IP',
+                                          '600/min'),
+    },
+
 }
 
+INGREDIENT_SEARCH_FUZZY = os.getenv('INGREDIENT_SEARCH_FUZZY', 'True') == 'True'
+
+IMAGE_DERIVATIVES_BACKGROUND = os.getenv(
+    'IMAGE_DERIVATIVES_BACKGROUND', 'True') == 'True'
+
+FEED_FANOUT_BACKGROUND = os.getenv('FEED_FANOUT_BACKGROUND', 'True') == 'True'
+
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS') == 'True'
+
+ASYNC_VIEWS_THREADS = int(os.getenv('ASYNC_VIEWS_THREADS', 8))
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+METRICS_DIR = os.getenv('METRICS_DIR', '/tmp/foodgram_metrics')
+
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        seconds=int(os.getenv('JWT_ACCESS_SECONDS', 300))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(
+        seconds=int(os.getenv('JWT_REFRESH_SECONDS', 86400))),
+    'ROTATE_REFRESH_TOKENS': True,
+    'BLACKLIST_AFTER_ROTATION': False,
+    'UPDATE_LAST_LOGIN': False,
+    'AUTH_HEADER_TYPES': ('Bearer',),
+}
 
 DJOSER = {
     'SERIALIZERS': {
@@ -3,14 +3,25 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from recipes.urls import router
+from recipes.async_views import with_async_views
+from recipes.urls import jwt_urls, router
+
+from .metrics import metrics_view
+
+api_urls = router.urls
+if settings.ASYNC_VIEWS:
+    api_urls = with_async_views(api_urls)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include(router.urls)),
+    path('api/metrics', metrics_view, name='metrics'),
+    path('api/', include(api_urls)),
     path('api/auth/', include('djoser.urls.authtoken')),
 ]
 
+if settings.AUTH_MODE == 'jwt':
+    urlpatterns.append(path('api/auth/', include(jwt_urls)))
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL,
                           document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,10 @@
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+
+def child_exit(server, worker):
+    """Снимок метрик завершившегося воркера переносится в общий файл."""
+    from backend.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
@@ -1,7 +1,11 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
 
-from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+from .models import (Favorite, FeedEntry, Ingredient, IngredientRecipe, Recipe,
                      ShoppingCart, Tag)
+from .shopping_cart import rebuild_totals
+
+User = get_user_model()
 
 
 class IngredientRecipeInline(admin.TabularInline):
@@ -13,11 +17,18 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (IngredientRecipeInline,)
     list_display = (
         'name',
-        'author'
+        'author',
+        'favorites_count'
     )
     list_filter = ('author', 'name', 'tags')
+    readonly_fields = ('favorites_count',)
     filter_horizontal = ('ingredients',)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change:
+            rebuild_totals(User.objects.filter(carts__recipe=form.instance))
+
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = (
@@ -32,3 +43,4 @@ admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag)
 admin.site.register(Favorite)
 admin.site.register(ShoppingCart)
+admin.site.register(FeedEntry)
@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import URLPattern
+
+ASYNC_ROUTES = {
+    'recipes-list',
+    'recipes-detail',
+    'recipes-download-shopping-cart',
+    'tags-list',
+    'tags-detail',
+    'ingredient-list',
+    'ingredient-detail',
+    'foodgramuser-subscriptions',
+}
+
+executor = ThreadPoolExecutor(max_workers=settings.ASYNC_VIEWS_THREADS,
+                              thread_name_prefix='async-views')
+
+
+def run_view(view, request, args, kwargs):
+    """Выполняет синхронное представление в потоке пула целиком, вместе с
+    рендерингом ответа. Потоковый ответ собирается здесь же: в Django 3.2
+    ASGI-обработчик перебирает его прямо в цикле событий."""
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        if response.streaming:
+            streamed = response
+            response = HttpResponse(b''.join(streamed),
+                                    status=streamed.status_code)
+            for header, value in streamed.items():
+                response[header] = value
+            streamed.close()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Асинхронная обёртка над представлением DRF. Синхронный ORM и
+    сериализация выполняются в ограниченном пуле потоков, а цикл событий
+    в это время обслуживает медленных клиентов."""
+    run = sync_to_async(run_view, thread_sensitive=False, executor=executor)
+
+    async def wrapper(request, *args, **kwargs):
+        return await run(view, request, args, kwargs)
+
+    wrapper.csrf_exempt = getattr(view, 'csrf_exempt', False)
+    wrapper.cls = getattr(view, 'cls', None)
+    return wrapper
+
+
+def with_async_views(urlpatterns, names=ASYNC_ROUTES):
+    return [
+        URLPattern(pattern.pattern, async_view(pattern.callback),
+                   pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in urlpatterns
+    ]
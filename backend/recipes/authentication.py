@@ -0,0 +1,130 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .constants import (AUTH_LOCAL_CACHE_MAX_ENTRIES, AUTH_LOCAL_CACHE_TIMEOUT,
+                        AUTH_VERSION_CLAIM, AUTH_VERSION_KEY, JWT_REVOKED_KEY)
+from .versions import bump_versions, get_version, state_cache
+
+User = get_user_model()
+
+
+class LocalCache:
+    """LRU в памяти процесса с ограничением по размеру и времени жизни."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+users = LocalCache(AUTH_LOCAL_CACHE_MAX_ENTRIES, AUTH_LOCAL_CACHE_TIMEOUT)
+tokens = LocalCache(AUTH_LOCAL_CACHE_MAX_ENTRIES, AUTH_LOCAL_CACHE_TIMEOUT)
+
+
+def get_auth_version(user_id):
+    return get_version(AUTH_VERSION_KEY.format(user_id=user_id))
+
+
+def bump_auth_version(user_id):
+    """Сбрасывает все закешированные входы пользователя и делает
+    недействительными выданные ему JWT."""
+    bump_versions(AUTH_VERSION_KEY.format(user_id=user_id))
+
+
+def revoke_token(token):
+    """Отметка об отзыве живёт в кеше без вытеснения до истечения
+    срока токена."""
+    ttl = int(token['exp'] - time.time())
+    if ttl > 0:
+        state_cache().set(JWT_REVOKED_KEY.format(
+            jti=token[api_settings.JTI_CLAIM]), True, ttl)
+
+
+def check_not_revoked(token):
+    if state_cache().get(JWT_REVOKED_KEY.format(
+            jti=token[api_settings.JTI_CLAIM])) is not None:
+        raise InvalidToken('Токен отозван')
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if token.get(AUTH_VERSION_CLAIM) != get_auth_version(user_id):
+        raise InvalidToken('Токен отозван')
+
+
+def get_cached_user(user_id, version, load):
+    user = users.get((user_id, version))
+    if user is None:
+        user = load()
+        users.set((user_id, version), user)
+    return copy.copy(user)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Токен и пользователь кешируются в памяти процесса, request.auth и
+    при попадании в кеш – экземпляр Token. Выход, смена пароля и любое
+    сохранение пользователя меняют его версию в общем кеше, поэтому
+    устаревшие записи не используются ни в одном воркере."""
+
+    def authenticate_credentials(self, key):
+        cached = tokens.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            tokens.set(key, self.get_model()(
+                key=token.key, user_id=user.id, created=token.created))
+            users.set((user.id, get_auth_version(user.id)), user)
+            return copy.copy(user), token
+        user = get_cached_user(
+            cached.user_id, get_auth_version(cached.user_id),
+            lambda: super(CachedTokenAuthentication, self)
+            .authenticate_credentials(key)[0])
+        token = copy.copy(cached)
+        token.user = user
+        return user, token
+
+
+class FoodgramJWTAuthentication(JWTAuthentication):
+    """Проверка JWT без обращения к базе: подпись и срок проверяются
+    локально, отзыв – по кешу 'state', пользователь берётся из кеша."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        check_not_revoked(token)
+        return token
+
+    def get_user(self, validated_token):
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        user = get_cached_user(
+            user_id, validated_token[AUTH_VERSION_CLAIM],
+            lambda: super(FoodgramJWTAuthentication, self).get_user(
+                validated_token))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'Пользователь неактивен')
+        return user
@@ -0,0 +1,66 @@
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+ADDED = 'added'
+EXISTS = 'exists'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+
+
+def insert_links(model, owner_field, target_field, owner_id, target_ids):
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING: возвращает id объектов,
+    связи с которыми вставил этот запрос. Связи, которые успела добавить
+    параллельная транзакция, в результат не попадают."""
+    if not target_ids:
+        return set()
+    quote = connection.ops.quote_name
+    owner_column = quote(model._meta.get_field(owner_field).column)
+    target_column = quote(model._meta.get_field(target_field).column)
+    values = ', '.join(['(%s, %s)'] * len(target_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} '
+            f'({owner_column}, {target_column}) VALUES {values} '
+            f'ON CONFLICT DO NOTHING RETURNING {target_column}',
+            [value for target_id in target_ids
+             for value in (owner_id, target_id)]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def add_links(model, owner_field, target_field, owner, targets, ids,
+              messages, forbidden_ids=()):
+    """Добавляет связи владельца с объектами из списка id одним INSERT.
+    Сигналы post_save при этом не отправляются, поэтому вызывающий код
+    сам обновляет счётчики и кеши по возвращённым id – только по тем
+    связям, которые действительно вставлены."""
+    ids = list(dict.fromkeys(ids))
+    state = dict(targets.filter(id__in=ids).annotate(linked=Exists(
+        model.objects.filter(**{owner_field: owner,
+                                target_field: OuterRef('pk')})
+    )).values_list('id', 'linked'))
+    added_ids = insert_links(
+        model, owner_field, target_field, owner.pk,
+        [target_id for target_id in ids if target_id not in forbidden_ids
+         and target_id in state and not state[target_id]]
+    )
+    results = []
+    for target_id in ids:
+        if target_id in forbidden_ids:
+            status = FORBIDDEN
+        elif target_id not in state:
+            status = NOT_FOUND
+        elif target_id in added_ids:
+            status = ADDED
+        else:
+            status = EXISTS
+        result = {'id': target_id, 'status': status}
+        if status in messages:
+            result['errors'] = messages[status]
+        results.append(result)
+    return {
+        'results': results,
+        'summary': Counter(result['status'] for result in results),
+    }, [target_id for target_id in ids if target_id in added_ids]
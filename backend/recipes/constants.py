@@ -16,3 +16,52 @@ AMOUNT_MIN_MESSAGE = (f'Количество не должно'
 AMOUNT_MAX_VALUE = 1000
 AMOUNT_MAX_MESSAGE = (f'Количество не должно'
                       f'быть больше {AMOUNT_MAX_VALUE} минуты')
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60
+SHOPPING_CART_FILENAME = 'shopping_cart'
+INGREDIENT_VERSION_KEY = 'ingredient_version'
+TAG_VERSION_KEY = 'tag_version'
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+INGREDIENT_TRIGRAM_THRESHOLD = 0.3
+INGREDIENT_TRIGRAM_LIMIT = 10
+INGREDIENTS_BATCH_SIZE = 1000
+IMAGE_DERIVATIVES_DIR = 'recipes/images/derivatives/'
+IMAGE_DERIVATIVE_SIZES = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+IMAGE_DERIVATIVE_FORMAT = 'WEBP'
+IMAGE_DERIVATIVE_EXTENSION = 'webp'
+IMAGE_DERIVATIVE_QUALITY = 80
+IMAGE_DERIVATIVE_WORKERS = 2
+FEED_MAX_ENTRIES = 500
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_FANOUT_BATCH_SIZE = 100
+FEED_FANOUT_WORKERS = 1
+SEARCH_CONFIG = 'russian'
+RECIPE_SEARCH_VERSION_KEY = 'recipe_search_version'
+RECIPE_SEARCH_WEIGHTS = {'name': 1.0, 'text': 0.4}
+RECIPE_FRAGMENT_TIMEOUT = 60 * 60 * 24
+RECIPE_FRAGMENT_LOCK_TIMEOUT = 10
+RECIPE_FRAGMENT_LOCK_WAIT = 0.2
+RECIPE_FRAGMENT_LOCK_POLL = 0.05
+SEED_BATCH_SIZE = 5000
+SEED_IMAGE_NAME = 'recipes/images/seed.png'
+SEED_IMAGE_SIZE = (64, 64)
+SEED_INGREDIENTS_PER_RECIPE = (3, 10)
+SEED_TAGS = (
+    ('Завтрак', 'orange', 'breakfast'),
+    ('Обед', 'green', 'lunch'),
+    ('Ужин', 'purple', 'dinner'),
+)
+SEED_DISTINCT_ROUNDS = 10
+FIXTURES_EXPONENT = 1.1
+FIXTURES_AMOUNT_MEDIAN = 50
+BULK_MAX_IDS = 100
+SLOW_CLIENT_BODY_SIZE = 64
+AUTH_VERSION_KEY = 'auth_version:{user_id}'
+AUTH_VERSION_CLAIM = 'auth_version'
+JWT_REVOKED_KEY = 'jwt_revoked:{jti}'
+AUTH_LOCAL_CACHE_TIMEOUT = 60
+AUTH_LOCAL_CACHE_MAX_ENTRIES = 10000
+PLAN_CHECK_MIN_ROWS = 10000
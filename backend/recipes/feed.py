@@ -0,0 +1,189 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL, Window
+from django.db.models.functions import RowNumber
+
+from users.models import Subscriptions
+
+from .constants import (FEED_FANOUT_BATCH_SIZE, FEED_FANOUT_MAX_FOLLOWERS,
+                        FEED_FANOUT_WORKERS, FEED_MAX_ENTRIES)
+from .models import FeedEntry, Recipe
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(max_workers=FEED_FANOUT_WORKERS,
+                              thread_name_prefix='feed-fanout')
+
+
+def is_fanned_out(author):
+    return author.followers_count <= FEED_FANOUT_MAX_FOLLOWERS
+
+
+def is_fanned_out_id(author_id):
+    return User.objects.filter(
+        pk=author_id, followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def run_in_background(function, *args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('Не удалось разложить ленту: %s%s',
+                         function.__name__, args)
+    finally:
+        close_old_connections()
+
+
+def schedule_fan_out(function, *args):
+    """Раскладка по лентам подписчиков выполняется после фиксации
+    транзакции в фоновом потоке, запрос её не ждёт. При
+    FEED_FANOUT_BACKGROUND=False – сразу после фиксации в том же потоке."""
+    if settings.FEED_FANOUT_BACKGROUND:
+        transaction.on_commit(lambda: executor.submit(
+            run_in_background, function, *args))
+    else:
+        transaction.on_commit(lambda: function(*args))
+
+
+def follower_batches(author_id):
+    last_id = 0
+    while True:
+        follower_ids = list(Subscriptions.objects.filter(
+            following_id=author_id, follower_id__gt=last_id
+        ).order_by('follower_id').values_list(
+            'follower_id', flat=True)[:FEED_FANOUT_BATCH_SIZE])
+        if not follower_ids:
+            return
+        last_id = follower_ids[-1]
+        yield follower_ids
+
+
+def trim_feeds(user_ids=None):
+    entries = FeedEntry.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    ranked = entries.annotate(
+        row_number=Window(
+            RowNumber(),
+            partition_by=F('user_id'),
+            order_by=F('recipe_id').desc()
+        )
+    ).order_by().values('id', 'row_number')
+    sql, params = ranked.query.sql_with_params()
+    FeedEntry.objects.filter(id__in=RawSQL(
+        f'SELECT id FROM ({sql}) AS ranked WHERE row_number > %s',
+        (*params, FEED_MAX_ENTRIES)
+    )).delete()
+
+
+def fan_out_recipe(recipe_id, author_id):
+    """Новый рецепт добавляется в ленты подписчиков пачками по
+    FEED_FANOUT_BATCH_SIZE, каждая пачка – в своей транзакции."""
+    if not is_fanned_out_id(author_id):
+        return
+    for follower_ids in follower_batches(author_id):
+        with transaction.atomic():
+            FeedEntry.objects.bulk_create(
+                [FeedEntry(user_id=follower_id, author_id=author_id,
+                           recipe_id=recipe_id)
+                 for follower_id in follower_ids],
+                ignore_conflicts=True
+            )
+            trim_feeds(follower_ids)
+
+
+def add_author_to_feed(follower_id, author):
+    add_authors_to_feed(follower_id, [author])
+
+
+def add_authors_to_feed(follower_id, authors):
+    author_ids = [author.id for author in authors if is_fanned_out(author)]
+    if not author_ids:
+        return
+    recipes = Recipe.objects.latest_per_author(
+        author_ids, FEED_MAX_ENTRIES
+    ).order_by('-id').values_list('id', 'author_id')[:FEED_MAX_ENTRIES]
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=follower_id, author_id=author_id,
+                   recipe_id=recipe_id)
+         for recipe_id, author_id in recipes],
+        ignore_conflicts=True
+    )
+    trim_feeds([follower_id])
+
+
+def remove_author_from_feed(follower_id, author_id):
+    FeedEntry.objects.filter(user_id=follower_id, author_id=author_id).delete()
+
+
+def fan_out_author(author_id):
+    """Автор перестал быть популярным: его последние рецепты раскладываются
+    по лентам всех подписчиков, иначе старые записи пропали бы из лент.
+    Подписчики обрабатываются пачками по FEED_FANOUT_BATCH_SIZE."""
+    if not is_fanned_out_id(author_id):
+        return
+    recipe_ids = list(Recipe.objects.filter(author_id=author_id).order_by(
+        '-id').values_list('id', flat=True)[:FEED_MAX_ENTRIES])
+    if not recipe_ids:
+        return
+    for follower_ids in follower_batches(author_id):
+        with transaction.atomic():
+            FeedEntry.objects.bulk_create(
+                [FeedEntry(user_id=follower_id, author_id=author_id,
+                           recipe_id=recipe_id)
+                 for follower_id in follower_ids
+                 for recipe_id in recipe_ids],
+                batch_size=FEED_MAX_ENTRIES, ignore_conflicts=True
+            )
+            trim_feeds(follower_ids)
+
+
+def rebuild_feeds():
+    """Заполняет ленты заново по подпискам. Нужна после массовой загрузки
+    данных, при которой сигналы не срабатывают."""
+    FeedEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FeedEntry._meta.db_table} '
+            f'(user_id, author_id, recipe_id) '
+            f'SELECT subscription.follower_id, recipe.author_id, recipe.id '
+            f'FROM {Subscriptions._meta.db_table} AS subscription '
+            f'JOIN {Recipe._meta.db_table} AS recipe '
+            f'ON recipe.author_id = subscription.following_id '
+            f'JOIN {User._meta.db_table} AS author '
+            f'ON author.id = subscription.following_id '
+            f'WHERE author.followers_count <= %s',
+            (FEED_FANOUT_MAX_FOLLOWERS,)
+        )
+    trim_feeds()
+
+
+def read_feed(user, recipes, before, limit):
+    """Id рецептов ленты от новых к старым, меньше before. Материализованная
+    лента читается одним диапазоном индекса (user, recipe_id), рецепты
+    популярных авторов – по индексу (author, -id). recipes – queryset
+    с фильтрами запроса, без фильтров не используется."""
+    entries = FeedEntry.objects.filter(user=user)
+    pulled = Recipe.objects.filter(author_id__in=Subscriptions.objects.filter(
+        follower=user,
+        following__followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS
+    ).values('following_id'))
+    if before is not None:
+        entries = entries.filter(recipe_id__lt=before)
+        pulled = pulled.filter(id__lt=before)
+    if recipes.query.has_filters():
+        entries = entries.filter(recipe_id__in=recipes.values('id'))
+        pulled = pulled.filter(id__in=recipes.values('id'))
+    recipe_ids = set(entries.order_by('-recipe_id').values_list(
+        'recipe_id', flat=True)[:limit])
+    recipe_ids.update(pulled.order_by('-id').values_list(
+        'id', flat=True)[:limit])
+    return sorted(recipe_ids, reverse=True)[:limit]
@@ -1,34 +1,66 @@
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.constants import REFERENCE_CACHE_TIMEOUT, TAG_VERSION_KEY
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from recipes.search import search_recipes
+from recipes.versions import get_version
+
+TAG_MAP_KEY = 'tag_map:{version}'
+
+
+def get_tag_map():
+    """Слаги тегов и их id из кеша, сбрасывается вместе с версией тегов."""
+    key = TAG_MAP_KEY.format(version=get_version(TAG_VERSION_KEY))
+    tag_map = cache.get(key)
+    if tag_map is None:
+        tag_map = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_map, REFERENCE_CACHE_TIMEOUT)
+    return tag_map
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_map()]
 
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    """Связанные таблицы проверяются через EXISTS, а не JOIN: строки
+    рецептов не размножаются при нескольких тегах, и DISTINCT не нужен."""
+    author = filters.NumberFilter(field_name='author_id')
+    tags = filters.MultipleChoiceFilter(choices=get_tag_choices,
+                                        method='get_tags')
     is_favorited = filters.BooleanFilter(
         method='get_is_favorited'
     )
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search')
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        tag_map = get_tag_map()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'),
+            tag_id__in=[tag_map[slug] for slug in value]
+        )))
 
     def get_is_favorited(self, queryset, name, value):
-        return queryset.filter(
-            favorite_recipe__user__id=self.request.user.id
-        ) if value else queryset
+        return queryset.filter(Exists(Favorite.objects.filter(
+            user_id=self.request.user.id, recipe_id=OuterRef('pk')
+        ))) if value else queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
-        return queryset.filter(
-            carts__user__id=self.request.user.id) if value else queryset
-
+        return queryset.filter(Exists(ShoppingCart.objects.filter(
+            user_id=self.request.user.id, recipe_id=OuterRef('pk')
+        ))) if value else queryset
 
-class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ('name', )
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value) if value.strip() else queryset
@@ -0,0 +1,130 @@
+import time
+
+from django.core.cache import cache, caches
+
+from .constants import (INGREDIENT_VERSION_KEY, RECIPE_FRAGMENT_LOCK_POLL,
+                        RECIPE_FRAGMENT_LOCK_TIMEOUT,
+                        RECIPE_FRAGMENT_LOCK_WAIT, RECIPE_FRAGMENT_TIMEOUT,
+                        TAG_VERSION_KEY)
+from .versions import bump_versions, get_versions
+
+RECIPE_VERSION_KEY = 'recipe_version:{recipe_id}'
+AUTHOR_VERSION_KEY = 'author_version:{user_id}'
+FRAGMENT_KEY = 'recipe_fragment:{host}:{recipe_id}:{versions}'
+LOCK_KEY = '{key}:lock'
+HITS_KEY = 'recipe_fragments:hits'
+MISSES_KEY = 'recipe_fragments:misses'
+REBUILD_MS_KEY = 'recipe_fragments:rebuild_ms'
+
+
+def fragment_cache():
+    return caches['recipe_fragments']
+
+
+def bump_recipe_versions(recipe_ids):
+    bump_versions(*[RECIPE_VERSION_KEY.format(recipe_id=recipe_id)
+                    for recipe_id in recipe_ids])
+
+
+def bump_author_version(user_id):
+    bump_versions(AUTHOR_VERSION_KEY.format(user_id=user_id))
+
+
+def increment(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, delta)
+
+
+def get_stats():
+    stats = cache.get_many((HITS_KEY, MISSES_KEY, REBUILD_MS_KEY))
+    return {
+        'hits': stats.get(HITS_KEY, 0),
+        'misses': stats.get(MISSES_KEY, 0),
+        'rebuild_ms': stats.get(REBUILD_MS_KEY, 0),
+    }
+
+
+def get_fragment_versions(recipes):
+    """Версии пар (id рецепта, id автора) одной строкой. Строка меняется
+    при правке рецепта, его автора, любого тега или ингредиента."""
+    version_keys = {
+        recipe_id: (
+            RECIPE_VERSION_KEY.format(recipe_id=recipe_id),
+            AUTHOR_VERSION_KEY.format(user_id=author_id),
+            TAG_VERSION_KEY,
+            INGREDIENT_VERSION_KEY,
+        )
+        for recipe_id, author_id in recipes
+    }
+    versions = get_versions(
+        {key for keys in version_keys.values() for key in keys})
+    return {
+        recipe_id: '.'.join(versions[key] for key in keys)
+        for recipe_id, keys in version_keys.items()
+    }
+
+
+def get_fragment_keys(recipes, host):
+    versions = get_fragment_versions(
+        (recipe.id, recipe.author_id) for recipe in recipes)
+    return {
+        recipe_id: FRAGMENT_KEY.format(
+            host=host, recipe_id=recipe_id, versions=recipe_versions)
+        for recipe_id, recipe_versions in versions.items()
+    }
+
+
+def wait_for_fragments(keys):
+    deadline = time.monotonic() + RECIPE_FRAGMENT_LOCK_WAIT
+    found = {}
+    while keys and time.monotonic() < deadline:
+        time.sleep(RECIPE_FRAGMENT_LOCK_POLL)
+        found.update(fragment_cache().get_many(keys))
+        keys = [key for key in keys if key not in found]
+    return found
+
+
+def get_fragments(recipes, host, build):
+    """Возвращает не зависящие от пользователя представления рецептов.
+    Отсутствующие в кэше строит один воркер, остальные недолго ждут его
+    результата, чтобы не пересобирать одно и то же одновременно."""
+    keys = get_fragment_keys(recipes, host)
+    cached = fragment_cache().get_many(keys.values())
+    fragments = {}
+    missing = []
+    for recipe in recipes:
+        fragment = cached.get(keys[recipe.id])
+        if fragment is None:
+            missing.append(recipe)
+        else:
+            fragments[recipe.id] = fragment
+    if not missing:
+        increment(HITS_KEY, len(recipes))
+        return fragments
+    locked = [recipe for recipe in missing if fragment_cache().add(
+        LOCK_KEY.format(key=keys[recipe.id]), 1,
+        RECIPE_FRAGMENT_LOCK_TIMEOUT)]
+    waiting = [recipe for recipe in missing if recipe not in locked]
+    if waiting:
+        found = wait_for_fragments([keys[recipe.id] for recipe in waiting])
+        for recipe in waiting:
+            if keys[recipe.id] in found:
+                fragments[recipe.id] = found[keys[recipe.id]]
+    to_build = [recipe for recipe in missing if recipe.id not in fragments]
+    started = time.perf_counter()
+    built = build(to_build)
+    fragment_cache().set_many(
+        {keys[recipe_id]: fragment for recipe_id, fragment in built.items()},
+        RECIPE_FRAGMENT_TIMEOUT
+    )
+    fragment_cache().delete_many(
+        [LOCK_KEY.format(key=keys[recipe.id]) for recipe in locked])
+    fragments.update(built)
+    increment(HITS_KEY, len(recipes) - len(to_build))
+    increment(MISSES_KEY, len(to_build))
+    increment(REBUILD_MS_KEY,
+              round((time.perf_counter() - started) * 1000))
+    return fragments
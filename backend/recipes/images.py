@@ -0,0 +1,72 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .constants import (IMAGE_DERIVATIVE_EXTENSION, IMAGE_DERIVATIVE_FORMAT,
+                        IMAGE_DERIVATIVE_QUALITY, IMAGE_DERIVATIVE_SIZES,
+                        IMAGE_DERIVATIVE_WORKERS, IMAGE_DERIVATIVES_DIR)
+from .fragments import bump_recipe_versions
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(max_workers=IMAGE_DERIVATIVE_WORKERS,
+                              thread_name_prefix='image-derivatives')
+
+
+def derivative_name(name, size):
+    """Имя копии содержит полный путь оригинала вместе с расширением:
+    temp.png и temp.jpg получают разные копии."""
+    return (f'{IMAGE_DERIVATIVES_DIR}{name}_{size}.'
+            f'{IMAGE_DERIVATIVE_EXTENSION}')
+
+
+def derivative_url(recipe, size):
+    if recipe.image_derivatives_of and (
+            recipe.image_derivatives_of == recipe.image.name):
+        return default_storage.url(derivative_name(recipe.image.name, size))
+    return recipe.image.url
+
+
+def build_derivatives(recipe_id, name):
+    with default_storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    for size, bounds in IMAGE_DERIVATIVE_SIZES.items():
+        derivative = image.copy()
+        derivative.thumbnail(bounds)
+        buffer = io.BytesIO()
+        derivative.save(buffer, IMAGE_DERIVATIVE_FORMAT,
+                        quality=IMAGE_DERIVATIVE_QUALITY)
+        path = derivative_name(name, size)
+        default_storage.delete(path)
+        default_storage.save(path, ContentFile(buffer.getvalue()))
+    if Recipe.objects.filter(pk=recipe_id, image=name).update(
+            image_derivatives_of=name, updated_at=timezone.now()):
+        bump_recipe_versions([recipe_id])
+
+
+def build_derivatives_in_background(recipe_id, name):
+    try:
+        build_derivatives(recipe_id, name)
+    except Exception:
+        logger.exception('Не удалось построить копии изображения %s', name)
+    finally:
+        close_old_connections()
+
+
+def schedule_derivatives(recipe):
+    """При IMAGE_DERIVATIVES_BACKGROUND=False копии не строятся при
+    сохранении, их строит команда build_image_derivatives."""
+    if not settings.IMAGE_DERIVATIVES_BACKGROUND:
+        return
+    recipe_id, name = recipe.pk, recipe.image.name
+    transaction.on_commit(lambda: executor.submit(
+        build_derivatives_in_background, recipe_id, name))
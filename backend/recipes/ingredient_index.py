@@ -0,0 +1,91 @@
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+
+from .constants import (INGREDIENT_TRIGRAM_LIMIT, INGREDIENT_TRIGRAM_THRESHOLD,
+                        INGREDIENT_VERSION_KEY)
+from .models import Ingredient
+from .versions import bump_versions, get_version
+
+PREFIX_END = '\U0010ffff'
+
+
+def get_trigrams(value):
+    padded = f'  {value} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IngredientIndex:
+    """Отсортированный по casefold-названию каталог ингредиентов в памяти
+    процесса. Версия каталога хранится в общем кэше, поэтому изменения
+    в одном воркере приводят к перестроению индекса во всех остальных."""
+
+    def __init__(self):
+        self.version = None
+        self.snapshot = ([], [], [], {})
+        self.lock = threading.Lock()
+
+    def build(self):
+        ingredients = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda ingredient: (ingredient['name'].casefold(),
+                                    ingredient['id'])
+        )
+        keys = [ingredient['name'].casefold() for ingredient in ingredients]
+        gram_counts = []
+        trigrams = {}
+        for position, key in enumerate(keys):
+            grams = get_trigrams(key)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                trigrams.setdefault(gram, []).append(position)
+        self.snapshot = (keys, ingredients, gram_counts, trigrams)
+
+    def ensure_current(self):
+        version = get_version(INGREDIENT_VERSION_KEY)
+        if version == self.version:
+            return
+        with self.lock:
+            if version != self.version:
+                self.build()
+                self.version = version
+
+    def invalidate(self):
+        bump_versions(INGREDIENT_VERSION_KEY)
+
+    def search(self, query):
+        self.ensure_current()
+        keys, ingredients, gram_counts, trigrams = self.snapshot
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + PREFIX_END, lo=start)
+        results = ingredients[start:end]
+        results.extend(
+            ingredients[position]
+            for position, key in enumerate(keys)
+            if (position < start or position >= end) and query in key
+        )
+        if results or not settings.INGREDIENT_SEARCH_FUZZY:
+            return results
+        return self.search_similar(query)
+
+    def search_similar(self, query):
+        keys, ingredients, gram_counts, trigrams = self.snapshot
+        query_grams = get_trigrams(query)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(trigrams.get(gram, ()))
+        scored = []
+        for position, count in shared.items():
+            similarity = count / (
+                len(query_grams) + gram_counts[position] - count)
+            if similarity >= INGREDIENT_TRIGRAM_THRESHOLD:
+                scored.append((-similarity, keys[position], position))
+        scored.sort()
+        return [ingredients[position]
+                for _, _, position in scored[:INGREDIENT_TRIGRAM_LIMIT]]
+
+
+ingredient_index = IngredientIndex()
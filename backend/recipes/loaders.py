@@ -0,0 +1,40 @@
+from users.models import Subscriptions
+
+
+class SubscriptionLoader:
+    """Собирает id авторов в рамках запроса и отвечает на is_subscribed
+    одним запросом к базе вместо запроса на каждого пользователя."""
+
+    def __init__(self, user):
+        self.user = user
+        self.pending = set()
+        self.cache = {}
+
+    @classmethod
+    def for_request(cls, request):
+        loader = getattr(request, '_subscription_loader', None)
+        if loader is None:
+            loader = cls(request.user)
+            request._subscription_loader = loader
+        return loader
+
+    def prime(self, user_ids):
+        self.pending.update(
+            user_id for user_id in user_ids if user_id not in self.cache
+        )
+
+    def load(self, user_id):
+        if user_id not in self.cache:
+            self.pending.add(user_id)
+            self.resolve()
+        return self.cache[user_id]
+
+    def resolve(self):
+        user_ids, self.pending = self.pending, set()
+        subscribed = set()
+        if self.user.is_authenticated and user_ids:
+            subscribed = set(Subscriptions.objects.filter(
+                follower=self.user, following__in=user_ids
+            ).values_list('following_id', flat=True))
+        for user_id in user_ids:
+            self.cache[user_id] = user_id in subscribed
@@ -0,0 +1,385 @@
+import json
+import random
+import re
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.constants import SLOW_CLIENT_BODY_SIZE
+from recipes.models import Favorite, Recipe, Tag
+from recipes.seeding import (ensure_ingredients, ensure_tags,
+                             refresh_denormalized, seed_activity, seed_recipes,
+                             seed_users)
+
+User = get_user_model()
+
+QUERIES_METRIC = re.compile(
+    r'^foodgram_db_queries_per_request_(sum|count)'
+    r'\{route="([^"]*)",method="([^"]*)"\} (\S+)$'
+)
+
+
+DEFAULT_COLLECTION_PATH = settings.BASE_DIR.parent / 'postman-collection' / (
+    'diploma.postman_collection.json')
+POSTMAN_VARIABLE = re.compile(r'{{(\w+)}}')
+
+
+def list_recipes(context, client, rng):
+    return {}, {'page': rng.randint(1, context['pages']), 'limit': 6}
+
+
+def filter_by_tags(context, client, rng):
+    second, third = rng.sample(context['tags'], 2)
+    return {'secondTagSlug': second, 'thirdTagSlug': third}, {}
+
+
+def toggle_favorite(context, client, rng):
+    if 'candidates' not in client:
+        client['candidates'] = [recipe_id for recipe_id in context['recipes']
+                                if recipe_id not in client['favorites']]
+    if not client['candidates']:
+        raise CommandError('Все рецепты уже в избранном у клиента')
+    return {'firstRecipeId': rng.choice(client['candidates'])}, {}
+
+
+def list_subscriptions(context, client, rng):
+    return {}, {}
+
+
+def download_shopping_cart(context, client, rng):
+    return {}, {}
+
+
+# Сценарий: функция, которая выбирает значения переменных коллекции и
+# дополнительные параметры запроса, запросы коллекции и маршруты метрик.
+SCENARIOS = {
+    'list': (list_recipes, (
+        'get_recipes_list_with_limit_param // User',
+    ), ('recipes-list',)),
+    'filter_tags': (filter_by_tags, (
+        'get_recipes_list_with_two_tags_param // User',
+    ), ('recipes-list',)),
+    'favorite_toggle': (toggle_favorite, (
+        'add_to_favorite // User', 'remove_from_favorite // User',
+    ), ('recipes-favorite',)),
+    'subscriptions': (list_subscriptions, (
+        'get_subscription_list_with_recipes_limit_param // User',
+    ), ('foodgramuser-subscriptions',)),
+    'download_shopping_cart': (download_shopping_cart, (
+        'download_shopping_cart // User',
+    ), ('recipes-download-shopping-cart',)),
+}
+
+
+def load_collection(path):
+    """Запросы postman-коллекции по имени: метод и адрес без {{baseUrl}}."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            collection = json.load(file)
+    except (OSError, ValueError) as error:
+        raise CommandError(f'Не удалось прочитать коллекцию {path}: {error}')
+    requests = {}
+    items = list(collection['item'])
+    while items:
+        item = items.pop()
+        items.extend(item.get('item', ()))
+        if 'request' in item:
+            url = item['request']['url']
+            raw = url['raw'] if isinstance(url, dict) else url
+            requests[item['name']] = (item['request']['method'],
+                                      raw.replace('{{baseUrl}}', ''))
+    return requests
+
+
+def build_path(template, variables, params):
+    path = POSTMAN_VARIABLE.sub(
+        lambda match: urllib.parse.quote(str(variables[match[1]])), template)
+    if not params:
+        return path
+    parts = urllib.parse.urlsplit(path)
+    query = dict(urllib.parse.parse_qsl(parts.query))
+    query.update(params)
+    return parts._replace(query=urllib.parse.urlencode(query)).geturl()
+
+
+class SlowClient(threading.Thread):
+    """Клиент на медленном канале: отправляет тело POST-запроса по байту
+    с паузами и всё это время держит соединение с сервером."""
+
+    def __init__(self, url, token, interval, stop):
+        super().__init__(daemon=True)
+        self.address = urllib.parse.urlsplit(url)
+        self.token = token
+        self.interval = interval
+        self.stop = stop
+
+    def run(self):
+        headers = (
+            f'POST /api/recipes/ HTTP/1.1\r\n'
+            f'Host: {self.address.netloc}\r\n'
+            f'Authorization: Token {self.token}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {SLOW_CLIENT_BODY_SIZE}\r\n\r\n'
+        ).encode()
+        while not self.stop.is_set():
+            try:
+                with socket.create_connection(
+                        (self.address.hostname, self.address.port or 80)
+                ) as connection:
+                    connection.sendall(headers)
+                    for _ in range(SLOW_CLIENT_BODY_SIZE):
+                        if self.stop.wait(self.interval):
+                            return
+                        connection.sendall(b' ')
+                    connection.recv(1024)
+            except OSError:
+                self.stop.wait(self.interval)
+
+
+def percentile(values, share):
+    if not values:
+        return None
+    position = max(0, round(share * len(values)) - 1)
+    return values[min(position, len(values) - 1)]
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            cwd=settings.BASE_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу тестовыми данными и прогоняет сценарии '
+            'коллекции postman против запущенного сервера. Результаты '
+            'сохраняются в json для сравнения между коммитами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--favorites', type=int, default=2000)
+        parser.add_argument('--carts', type=int, default=500)
+        parser.add_argument('--subscriptions', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Количество итераций каждого сценария')
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS,
+                            default=list(SCENARIOS))
+        parser.add_argument('--collection', default=DEFAULT_COLLECTION_PATH,
+                            help='Postman-коллекция с запросами сценариев')
+        parser.add_argument('--metrics-token',
+                            default=settings.METRICS_TOKEN)
+        parser.add_argument('--slow-clients', type=int, default=0,
+                            help='Сколько медленных клиентов держат '
+                                 'соединения во время прогона')
+        parser.add_argument('--slow-interval', type=float, default=0.1,
+                            help='Пауза между байтами медленного клиента')
+        parser.add_argument('--output')
+
+    def handle(self, *args, **options):
+        self.url = options['url'].rstrip('/')
+        self.metrics_token = options['metrics_token']
+        rng = random.Random(options['seed'])
+        self.collection = load_collection(options['collection'])
+        missing = {name for scenario in options['scenarios']
+                   for name in SCENARIOS[scenario][1]} - self.collection.keys()
+        if missing:
+            raise CommandError(
+                f'В коллекции нет запросов: {", ".join(sorted(missing))}')
+        user_ids = self.seed(rng, options)
+        clients = self.get_clients(user_ids, options['concurrency'])
+        context = {
+            'recipes': list(Recipe.objects.values_list('id', flat=True)),
+            'tags': list(Tag.objects.values_list('slug', flat=True)),
+            'pages': max(1, Recipe.objects.count() // 6),
+        }
+        stop = threading.Event()
+        for number in range(options['slow_clients']):
+            SlowClient(self.url, clients[number % len(clients)]['token'],
+                       options['slow_interval'], stop).start()
+        results = {}
+        try:
+            for name in options['scenarios']:
+                results[name] = self.run_scenario(
+                    name, context, clients, rng, options)
+                self.print_result(name, results[name])
+        finally:
+            stop.set()
+        report = {
+            'commit': current_commit(),
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'url': self.url,
+            'concurrency': options['concurrency'],
+            'iterations': options['requests'],
+            'slow_clients': options['slow_clients'],
+            'dataset': {
+                key: options[key] for key in (
+                    'users', 'recipes', 'favorites', 'carts',
+                    'subscriptions', 'seed')
+            },
+            'scenarios': results,
+        }
+        output = options['output'] or (
+            f'benchmark-{datetime.now():%Y%m%d-%H%M%S}.json')
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Результаты: {output}'))
+
+    def seed(self, rng, options):
+        prefix = f'bench{options["seed"]}_'
+        user_ids = list(User.objects.filter(
+            username__startswith=prefix).values_list('id', flat=True))
+        if user_ids:
+            self.stdout.write('Используются ранее созданные данные')
+            return user_ids
+        ingredient_ids = ensure_ingredients()
+        tag_ids = ensure_tags()
+        user_ids = seed_users(prefix, options['users'])
+        recipe_ids = seed_recipes(rng, user_ids, options['recipes'],
+                                  tag_ids, ingredient_ids)
+        seed_activity(rng, user_ids, recipe_ids, options['favorites'],
+                      options['carts'], options['subscriptions'])
+        refresh_denormalized(stdout=self.stdout)
+        return user_ids
+
+    def get_clients(self, user_ids, count):
+        clients = []
+        for user_id in user_ids[:count]:
+            token, _ = Token.objects.get_or_create(user_id=user_id)
+            clients.append({
+                'token': token.key,
+                'favorites': set(Favorite.objects.filter(
+                    user_id=user_id).values_list('recipe_id', flat=True)),
+            })
+        if not clients:
+            raise CommandError('Нет пользователей для прогона сценариев')
+        return clients
+
+    def request(self, client, method, path):
+        request = urllib.request.Request(
+            self.url + path, method=method,
+            headers={'Authorization': f'Token {client["token"]}'}
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            status = error.code
+        except urllib.error.URLError:
+            status = 0
+        return status, time.perf_counter() - started
+
+    def run_iteration(self, steps, client):
+        return [self.request(client, method, path)
+                for method, path in steps]
+
+    def build_steps(self, name, context, client, rng):
+        build, requests, _ = SCENARIOS[name]
+        variables, params = build(context, client, rng)
+        steps = []
+        for request in requests:
+            method, template = self.collection[request]
+            steps.append((method, build_path(template, variables, params)))
+        return steps
+
+    def run_scenario(self, name, context, clients, rng, options):
+        routes = SCENARIOS[name][2]
+        iterations = [
+            (self.build_steps(name, context, clients[number % len(clients)],
+                              rng),
+             clients[number % len(clients)])
+            for number in range(options['requests'])
+        ]
+        before = self.scrape_queries()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            responses = [
+                response
+                for iteration in pool.map(
+                    lambda item: self.run_iteration(*item), iterations)
+                for response in iteration
+            ]
+        elapsed = time.perf_counter() - started
+        after = self.scrape_queries()
+        latencies = sorted(duration * 1000 for _, duration in responses)
+        statuses = Counter(status for status, _ in responses)
+        return {
+            'requests': len(responses),
+            'errors': sum(count for status, count in statuses.items()
+                          if not 200 <= status < 400),
+            'statuses': {str(status): count
+                         for status, count in sorted(statuses.items())},
+            'p50_ms': percentile(latencies, 0.5),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'mean_ms': sum(latencies) / len(latencies) if latencies else None,
+            'throughput_rps': len(responses) / elapsed if elapsed else None,
+            'queries_per_request': self.queries_per_request(
+                before, after, routes),
+        }
+
+    def scrape_queries(self):
+        if not self.metrics_token:
+            return None
+        request = urllib.request.Request(
+            f'{self.url}/api/metrics',
+            headers={'Authorization': f'Bearer {self.metrics_token}'}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                body = response.read().decode()
+        except urllib.error.URLError:
+            return None
+        values = defaultdict(float)
+        for line in body.splitlines():
+            match = QUERIES_METRIC.match(line)
+            if match:
+                kind, route, _, value = match.groups()
+                values[(kind, route)] += float(value)
+        return values
+
+    def queries_per_request(self, before, after, routes):
+        if before is None or after is None:
+            return None
+        total, count = (
+            sum(after[(kind, route)] - before[(kind, route)]
+                for route in routes)
+            for kind in ('sum', 'count')
+        )
+        return total / count if count else None
+
+    def print_result(self, name, result):
+        def value(key, unit=''):
+            if result[key] is None:
+                return '–'
+            return f'{result[key]:.1f}{unit}'
+
+        self.stdout.write(
+            f'{name}: {result["requests"]} запросов, '
+            f'ошибок {result["errors"]}, '
+            f'p50 {value("p50_ms", " мс")}, '
+            f'p95 {value("p95_ms", " мс")}, '
+            f'p99 {value("p99_ms", " мс")}, '
+            f'{value("throughput_rps")} запросов/с, '
+            f'SQL на запрос: {value("queries_per_request")}'
+        )
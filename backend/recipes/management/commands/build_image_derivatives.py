@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipes.images import build_derivatives
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии изображений для уже созданных рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перестроить копии и для рецептов, у которых они уже есть'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['force']:
+            recipes = recipes.exclude(image_derivatives_of=F('image'))
+        built = failed = 0
+        for recipe_id, name in recipes.values_list('id', 'image').iterator():
+            try:
+                build_derivatives(recipe_id, name)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+                continue
+            built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Построено: {built}, с ошибками: {failed}'))
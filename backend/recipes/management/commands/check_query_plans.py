@@ -0,0 +1,203 @@
+import json
+import re
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from recipes.constants import PLAN_CHECK_MIN_ROWS
+from recipes.models import Favorite, Ingredient, Recipe, Tag
+from users.models import Subscriptions
+
+User = get_user_model()
+
+SQLITE_PLAN_ROW = re.compile(r'^(SCAN|SEARCH) (?:TABLE )?(\w+)(.*)$')
+
+
+def get_scenarios():
+    """Запросы к API, SQL которых проверяется. Пользователь и автор
+    выбираются с данными, чтобы фильтры не возвращали пустой результат."""
+    user = User.objects.filter(
+        id__in=Favorite.objects.values('user_id')[:1]).first()
+    follower = User.objects.filter(
+        id__in=Subscriptions.objects.values('follower_id')[:1]).first()
+    author = User.objects.order_by('-recipes_count').first()
+    recipe = Recipe.objects.only('id', 'name').first()
+    ingredient = Ingredient.objects.order_by('id').first()
+    if not (user and follower and recipe and ingredient):
+        raise CommandError('База пуста, сначала выполните generate_fixtures')
+    tags = '&'.join(f'tags={slug}' for slug in Tag.objects.order_by(
+        'id').values_list('slug', flat=True)[:2])
+    word = recipe.name.split()[0]
+    return (
+        ('recipes', None, '/api/recipes/'),
+        ('recipes_user', user, '/api/recipes/'),
+        ('recipes_tags', user, f'/api/recipes/?{tags}'),
+        ('recipes_author', None, f'/api/recipes/?author={author.id}'),
+        ('recipes_favorited', user, '/api/recipes/?is_favorited=1'),
+        ('recipes_shopping_cart', user,
+         '/api/recipes/?is_in_shopping_cart=1'),
+        ('recipes_search', None, f'/api/recipes/?search={word}'),
+        ('recipe_detail', user, f'/api/recipes/{recipe.id}/'),
+        ('feed', follower, '/api/recipes/feed/'),
+        ('feed_tags', follower, f'/api/recipes/feed/?{tags}'),
+        ('download_shopping_cart', user,
+         '/api/recipes/download_shopping_cart/'),
+        ('subscriptions', user, '/api/users/subscriptions/?recipes_limit=3'),
+        ('user_detail', user, f'/api/users/{author.id}/'),
+        ('ingredients', None,
+         f'/api/ingredients/?name={ingredient.name[:3]}'),
+        ('tags', None, '/api/tags/'),
+    )
+
+
+def table_sizes(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'")
+            return dict(cursor.fetchall())
+        sizes = {}
+        for table in connection.introspection.table_names(cursor):
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+            sizes[table] = cursor.fetchone()[0]
+        return sizes
+
+
+def postgresql_scans(cursor, sql):
+    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = [plan[0]['Plan']]
+    scans = []
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get('Plans', ()))
+        if 'Relation Name' in node:
+            scans.append((node['Relation Name'],
+                          node['Node Type'] == 'Seq Scan',
+                          'Filter' in node))
+    return scans
+
+
+def sqlite_scans(cursor, sql):
+    """SCAN без индекса в SQLite – полное чтение таблицы. Исключение –
+    первая таблица запроса с LIMIT без сортировки во временном B-дереве:
+    она читается в порядке rowid и чтение останавливается на LIMIT."""
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+    details = [detail for *_, detail in cursor.fetchall()]
+    bounded = ' LIMIT ' in sql and not any(
+        'TEMP B-TREE' in detail for detail in details)
+    scans = []
+    for detail in details:
+        match = SQLITE_PLAN_ROW.match(detail)
+        if match:
+            kind, table, rest = match.groups()
+            sequential = kind == 'SCAN' and 'INDEX' not in rest and not (
+                bounded and not scans)
+            scans.append((table, sequential, ' WHERE ' in sql))
+    return scans
+
+
+PLAN_READERS = {
+    'postgresql': postgresql_scans,
+    'sqlite': sqlite_scans,
+}
+
+
+class Command(BaseCommand):
+    help = ('Выполняет основные запросы API на заполненной базе, строит '
+            'EXPLAIN для каждого SQL-запроса и завершается с ошибкой, если '
+            'большая таблица читается последовательно. Чтение всей таблицы '
+            'без условий, например COUNT(*) для пагинации, допускается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-rows', type=int,
+                            default=PLAN_CHECK_MIN_ROWS,
+                            help='С какого числа строк таблица '
+                                 'считается большой')
+        parser.add_argument('--verbose-sql', action='store_true')
+
+    def handle(self, *args, **options):
+        if settings.ASYNC_VIEWS:
+            raise CommandError('Запустите проверку с ASYNC_VIEWS=False: '
+                               'асинхронные представления выполняют SQL '
+                               'в других потоках')
+        for alias in connections:
+            if connections[alias].vendor not in PLAN_READERS:
+                raise CommandError(
+                    f'EXPLAIN для {connections[alias].vendor} '
+                    f'не поддерживается')
+        sizes = {alias: table_sizes(connections[alias])
+                 for alias in connections}
+        violations = 0
+        empty_caches = {
+            alias: {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': f'check_query_plans_{alias}',
+            }
+            for alias in settings.CACHES
+        }
+        with override_settings(ALLOWED_HOSTS=['testserver'],
+                               CACHES=empty_caches):
+            for name, user, url in get_scenarios():
+                violations += self.check_scenario(
+                    name, user, url, sizes, options)
+        if violations:
+            raise CommandError(
+                f'Последовательное чтение больших таблиц: {violations}')
+        self.stdout.write(self.style.SUCCESS('Планы запросов в порядке'))
+
+    def capture(self, user, url):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        with ExitStack() as stack:
+            contexts = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            }
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        queries = {}
+        for alias, context in contexts.items():
+            for query in context.captured_queries:
+                if query['sql'].lstrip().upper().startswith('SELECT'):
+                    queries.setdefault(query['sql'], alias)
+        return queries
+
+    def check_scenario(self, name, user, url, sizes, options):
+        queries = self.capture(user, url)
+        violations = 0
+        for sql, alias in queries.items():
+            connection = connections[alias]
+            with connection.cursor() as cursor:
+                scans = PLAN_READERS[connection.vendor](cursor, sql)
+            joined = len(scans) > 1
+            large = [
+                (table, sizes[alias].get(table, 0))
+                for table, sequential, filtered in scans
+                if sequential and (filtered or joined)
+                and sizes[alias].get(table, 0) >= options['min_rows']
+            ]
+            if large:
+                violations += 1
+                for table, rows in large:
+                    self.stdout.write(self.style.ERROR(
+                        f'{name}: последовательное чтение {table} '
+                        f'(~{int(rows)} строк)'))
+                self.stdout.write(f'    {sql}')
+            elif options['verbose_sql']:
+                self.stdout.write(f'{name}: {sql}')
+        self.stdout.write(f'{name}: проверено запросов {len(queries)}')
+        return violations
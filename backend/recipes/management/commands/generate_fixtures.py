@@ -0,0 +1,168 @@
+import math
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.constants import (AMOUNT_MAX_VALUE, AMOUNT_MIN_VALUE,
+                               COOKING_MAX_VALUE, COOKING_MIN_VALUE,
+                               FIXTURES_AMOUNT_MEDIAN, FIXTURES_EXPONENT,
+                               SEED_BATCH_SIZE, SEED_INGREDIENTS_PER_RECIPE)
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart)
+from recipes.seeding import (PowerLaw, bulk_insert, ensure_image,
+                             ensure_ingredients, ensure_tags,
+                             refresh_denormalized)
+from users.models import Subscriptions
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Генерирует большой воспроизводимый набор данных: '
+            'пользователей, рецепты, избранное, списки покупок и подписки '
+            'со степенным распределением популярности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--recipes', type=int, default=300000)
+        parser.add_argument('--authors-share', type=float, default=0.2,
+                            help='Доля пользователей, публикующих рецепты')
+        parser.add_argument('--favorites-per-user', type=float, default=20)
+        parser.add_argument('--carts-per-user', type=float, default=3)
+        parser.add_argument('--subscriptions-per-user', type=float,
+                            default=10)
+        parser.add_argument('--exponent', type=float,
+                            default=FIXTURES_EXPONENT)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='fixture')
+        parser.add_argument('--password',
+                            help='Пароль для первых --login-users '
+                                 'пользователей, остальные не могут войти')
+        parser.add_argument('--login-users', type=int, default=10)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже есть, '
+                f'укажите другой --prefix')
+        self.rng = random.Random(options['seed'])
+        self.started = time.monotonic()
+        ingredient_ids = ensure_ingredients()
+        self.ingredients = PowerLaw(
+            self.rng, Ingredient.objects.filter(
+                id__in=ingredient_ids).order_by('id').values_list(
+                'id', 'name'),
+            options['exponent'])
+        self.tag_ids = ensure_tags()
+        self.image = ensure_image()
+        with transaction.atomic():
+            user_ids = self.create_users(prefix, options)
+            author_ids = self.rng.sample(user_ids, max(1, round(
+                len(user_ids) * options['authors_share'])))
+            authors = PowerLaw(self.rng, author_ids, options['exponent'])
+            recipe_ids = self.create_recipes(authors, options['recipes'])
+            recipes = PowerLaw(self.rng, recipe_ids, options['exponent'])
+            self.create_links(
+                'избранное', Favorite, ('user_id', 'recipe_id'), user_ids,
+                recipes, options['favorites_per_user'])
+            self.create_links(
+                'списки покупок', ShoppingCart, ('user_id', 'recipe_id'),
+                user_ids, recipes, options['carts_per_user'])
+            self.create_links(
+                'подписки', Subscriptions, ('follower_id', 'following_id'),
+                user_ids, authors, options['subscriptions_per_user'],
+                exclude_self=True)
+            refresh_denormalized(stdout=self.stdout)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.report('готово')
+
+    def report(self, message):
+        self.stdout.write(
+            f'[{time.monotonic() - self.started:.1f} с] {message}')
+
+    def amount(self):
+        value = round(self.rng.lognormvariate(
+            math.log(FIXTURES_AMOUNT_MEDIAN), 1))
+        return min(AMOUNT_MAX_VALUE, max(AMOUNT_MIN_VALUE, value))
+
+    def create_users(self, prefix, options):
+        login_users = options['login_users'] if options['password'] else 0
+        # Поле пароля уникально, поэтому каждому пользователю со входом
+        # нужен свой хеш. Остальным хеширование не нужно: пароль с префиксом
+        # UNUSABLE_PASSWORD_PREFIX не подходит ни к какому вводу.
+        passwords = [make_password(options['password'])
+                     for _ in range(min(login_users, options['users']))]
+        count = bulk_insert(User, (
+            User(username=f'{prefix}{number}',
+                 email=f'{prefix}{number}@example.com',
+                 first_name='Пользователь', last_name=str(number),
+                 password=(passwords[number] if number < len(passwords)
+                           else f'{UNUSABLE_PASSWORD_PREFIX}{prefix}{number}'))
+            for number in range(options['users'])
+        ), ignore_conflicts=False)
+        self.report(f'пользователи: {count}')
+        return list(User.objects.filter(
+            username__startswith=prefix).order_by('id').values_list(
+            'id', flat=True))
+
+    def create_recipes(self, authors, count):
+        recipe_ids = []
+        links = tags = 0
+        for start in range(0, count, SEED_BATCH_SIZE):
+            recipes = [self.build_recipe(authors) for _ in range(
+                min(SEED_BATCH_SIZE, count - start))]
+            last_id = Recipe.objects.order_by('-id').values_list(
+                'id', flat=True).first() or 0
+            bulk_insert(Recipe, (recipe for recipe, _ in recipes),
+                        ignore_conflicts=False)
+            batch_ids = list(Recipe.objects.filter(id__gt=last_id).order_by(
+                'id').values_list('id', flat=True))
+            links += bulk_insert(IngredientRecipe, (
+                IngredientRecipe(recipe_id=recipe_id,
+                                 ingredient_id=ingredient_id,
+                                 amount=self.amount())
+                for recipe_id, (_, ingredients) in zip(batch_ids, recipes)
+                for ingredient_id, _ in ingredients
+            ), ignore_conflicts=False)
+            tags += bulk_insert(Recipe.tags.through, (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in batch_ids
+                for tag_id in self.rng.sample(
+                    self.tag_ids, self.rng.randint(1, len(self.tag_ids)))
+            ), ignore_conflicts=False)
+            recipe_ids.extend(batch_ids)
+        self.report(f'рецепты: {len(recipe_ids)}, ингредиенты рецептов: '
+                    f'{links}, теги рецептов: {tags}')
+        return recipe_ids
+
+    def build_recipe(self, authors):
+        ingredients = self.ingredients.pick_distinct(
+            self.rng.randint(*SEED_INGREDIENTS_PER_RECIPE))
+        names = [name for _, name in ingredients]
+        return Recipe(
+            author_id=authors.pick()[0],
+            name=f'{names[0].capitalize()} по-домашнему',
+            text=f'Понадобится: {", ".join(names)}.',
+            image=self.image,
+            cooking_time=self.rng.randint(COOKING_MIN_VALUE,
+                                          COOKING_MAX_VALUE)
+        ), ingredients
+
+    def create_links(self, title, model, fields, user_ids, targets, mean,
+                     exclude_self=False):
+        left_field, right_field = fields
+        count = bulk_insert(model, (
+            model(**{left_field: user_id, right_field: target_id})
+            for user_id in user_ids
+            for target_id in targets.pick_distinct(
+                round(self.rng.expovariate(1 / mean)) if mean else 0,
+                exclude={user_id} if exclude_self else ())
+        ), ignore_conflicts=False)
+        self.report(f'{title}: {count}')
@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.constants import (INGREDIENT_NAME_MAX_LENGTH,
+                               INGREDIENT_UNITS_MAX_LENGTH,
+                               INGREDIENTS_BATCH_SIZE)
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+STAGING_TABLE = 'ingredient_staging'
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) == 2:
+            yield row[0], row[1]
+        else:
+            yield None, None
+
+
+def read_json(file):
+    for item in json.load(file):
+        yield item.get('name'), item.get('measurement_unit')
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+class Command(BaseCommand):
+    help = ('Загружает каталог ингредиентов из csv или json. '
+            'Повторный запуск не создаёт дубликатов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=str(settings.BASE_DIR / 'ingredients.json'),
+            help='Путь к файлу ingredients.csv или ingredients.json'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json')
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+        with path.open(encoding='utf-8') as file:
+            rows, skipped = self.clean_rows(reader(file))
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                inserted = self.copy_rows(rows)
+            else:
+                inserted = self.bulk_create_rows(rows)
+        transaction.on_commit(ingredient_index.invalidate)
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {inserted}, '
+            f'уже в базе: {len(rows) - inserted}, '
+            f'пропущено: {skipped}'
+        ))
+
+    def clean_rows(self, raw_rows):
+        rows = {}
+        skipped = 0
+        for name, measurement_unit in raw_rows:
+            name = (name or '').strip()
+            measurement_unit = (measurement_unit or '').strip()
+            if (not name or not measurement_unit
+                    or len(name) > INGREDIENT_NAME_MAX_LENGTH
+                    or len(measurement_unit) > INGREDIENT_UNITS_MAX_LENGTH
+                    or (name, measurement_unit) in rows):
+                skipped += 1
+                continue
+            rows[(name, measurement_unit)] = None
+        return list(rows), skipped
+
+    def copy_rows(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {STAGING_TABLE} '
+                f'(name varchar, measurement_unit varchar) ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                f'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT name, measurement_unit FROM {STAGING_TABLE} '
+                f'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            return cursor.rowcount
+
+    def bulk_create_rows(self, rows):
+        existing = set(Ingredient.objects.values_list(
+            'name', 'measurement_unit'))
+        new_rows = [row for row in rows if row not in existing]
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=measurement_unit)
+             for name, measurement_unit in new_rows],
+            batch_size=INGREDIENTS_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        return len(new_rows)
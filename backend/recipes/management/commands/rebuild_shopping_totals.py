@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.shopping_cart import invalidate_carts, rebuild_totals
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает итоги списков покупок по текущему содержимому '
+            'корзин. Без аргументов – для всех пользователей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['user_ids']:
+            self.rebuild(options['user_ids'])
+            return
+        batch_size = options['batch_size']
+        last_id = 0
+        total = 0
+        while True:
+            ids = list(User.objects.filter(pk__gt=last_id).order_by(
+                'pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            self.rebuild(ids)
+            total += len(ids)
+        self.stdout.write(f'Итоги списков покупок пересчитаны: {total}')
+
+    def rebuild(self, user_ids):
+        with transaction.atomic():
+            rebuild_totals(User.objects.filter(pk__in=user_ids))
+            transaction.on_commit(lambda: invalidate_carts(user_ids))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.fragments import get_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает долю попаданий в кэш рецептов и время пересборки.'
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        requests = stats['hits'] + stats['misses']
+        hit_ratio = stats['hits'] / requests if requests else 0
+        rebuild_ms = (stats['rebuild_ms'] / stats['misses']
+                      if stats['misses'] else 0)
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            f'доля попаданий: {hit_ratio:.1%}, '
+            f'пересборка: {rebuild_ms:.2f} мс на рецепт'
+        )
@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipes.counters import count_of
+from recipes.models import Favorite, Recipe
+from users.models import Subscriptions
+
+User = get_user_model()
+
+COUNTERS = (
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscriptions, 'following'),
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики рецептов, подписчиков и избранного '
+            'и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, field, related_model, related_field in COUNTERS:
+            fixed = 0
+            last_id = 0
+            while True:
+                ids = list(model.objects.filter(pk__gt=last_id).order_by(
+                    'pk').values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                last_id = ids[-1]
+                drifted = list(model.objects.filter(pk__in=ids).annotate(
+                    actual=count_of(related_model, related_field)
+                ).exclude(**{field: F('actual')}).values_list(
+                    'pk', flat=True))
+                if drifted:
+                    fixed += model.objects.filter(pk__in=drifted).update(
+                        **{field: count_of(related_model, related_field)})
+            self.stdout.write(
+                f'{model._meta.model_name}.{field}: исправлено {fixed}')
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.16 on 2026-10-18 02:54
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        extra = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit']
+        ).exclude(id=duplicate['keep_id'])
+        IngredientRecipe.objects.filter(
+            ingredient__in=extra
+        ).update(ingredient_id=duplicate['keep_id'])
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+    # Слияние дубликатов выполняется в собственной транзакции: на PostgreSQL
+    # ALTER TABLE в одной транзакции с изменением связанных строк падает
+    # с ошибкой pending trigger events.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_name_measurement_unit'),
+        ),
+    ]
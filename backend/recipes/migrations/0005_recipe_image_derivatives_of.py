@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_derivatives_of',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Уменьшенные копии построены для'),
+        ),
+    ]
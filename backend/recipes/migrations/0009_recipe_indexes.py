@@ -0,0 +1,61 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:22
+
+from django.db import migrations, models, transaction
+from django.db.models import Count, Min, Sum
+
+from backend.indexes import (AddIndexConcurrently,
+                             AddUniqueConstraintConcurrently, is_postgresql)
+
+AMOUNT_MAX_VALUE = 1000
+TAG_INDEX = 'recipe_tags_tag_recipe'
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    duplicates = IngredientRecipe.objects.values(
+        'recipe_id', 'ingredient_id'
+    ).order_by().annotate(
+        rows=Count('id'), keep_id=Min('id'), total=Sum('amount')
+    ).filter(rows__gt=1)
+    with transaction.atomic():
+        for duplicate in duplicates:
+            IngredientRecipe.objects.filter(
+                recipe_id=duplicate['recipe_id'],
+                ingredient_id=duplicate['ingredient_id']
+            ).exclude(id=duplicate['keep_id']).delete()
+            IngredientRecipe.objects.filter(id=duplicate['keep_id']).update(
+                amount=min(duplicate['total'], AMOUNT_MAX_VALUE))
+
+
+def create_tag_index(apps, schema_editor):
+    concurrently = 'CONCURRENTLY ' if is_postgresql(schema_editor) else ''
+    schema_editor.execute(
+        f'CREATE INDEX {concurrently}IF NOT EXISTS {TAG_INDEX} '
+        f'ON recipes_recipe_tags (tag_id, recipe_id)')
+
+
+def drop_tag_index(apps, schema_editor):
+    concurrently = 'CONCURRENTLY ' if is_postgresql(schema_editor) else ''
+    schema_editor.execute(f'DROP INDEX {concurrently}IF EXISTS {TAG_INDEX}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0008_recipe_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-id'], name='recipe_author_id_desc'),
+        ),
+        migrations.RunPython(create_tag_index, drop_tag_index),
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+        AddUniqueConstraintConcurrently(
+            model_name='ingredientrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:26
+
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_totals(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingCartTotal = apps.get_model('recipes', 'ShoppingCartTotal')
+    rows = ShoppingCart.objects.exclude(
+        recipe__ingredients_used=None
+    ).values(
+        'user_id', 'recipe__ingredients_used__ingredient_id'
+    ).order_by().annotate(total=Sum('recipe__ingredients_used__amount'))
+    totals = (
+        ShoppingCartTotal(
+            user_id=row['user_id'],
+            ingredient_id=row['recipe__ingredients_used__ingredient_id'],
+            total_amount=row['total'])
+        for row in rows.iterator()
+    )
+    while True:
+        batch = list(islice(totals, 1000))
+        if not batch:
+            break
+        ShoppingCartTotal.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0009_recipe_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Итог списка покупок',
+                'verbose_name_plural': 'Итоги списков покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcarttotal',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_ingredient_total'),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def reset_image_derivatives(apps, schema_editor):
+    """Копии, построенные под старыми именами, больше не находятся: до
+    повторного запуска build_image_derivatives отдаются оригиналы."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.exclude(image_derivatives_of='').update(
+        image_derivatives_of='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_shoppingcarttotal'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_image_derivatives,
+                             migrations.RunPython.noop),
+    ]
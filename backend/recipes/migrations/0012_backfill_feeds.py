@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def backfill_feeds(apps, schema_editor):
+    """Ленты заполняются для подписок, созданных до появления FeedEntry."""
+    Subscriptions = apps.get_model('users', 'Subscriptions')
+    if not Subscriptions.objects.exists():
+        return
+    from recipes.feed import rebuild_feeds
+    rebuild_feeds()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_reset_image_derivatives'),
+        ('users', '0003_user_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_feeds, migrations.RunPython.noop),
+    ]
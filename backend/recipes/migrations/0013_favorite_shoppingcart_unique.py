@@ -0,0 +1,66 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:50
+
+from django.db import migrations, models, transaction
+from django.db.models import Count, Min, Sum
+
+from backend.indexes import AddUniqueConstraintConcurrently
+
+
+def delete_duplicates(model):
+    """Удаляет повторы пары пользователь – рецепт, оставляя первую запись.
+    Возвращает удалённые пары."""
+    duplicates = list(model.objects.values('user_id', 'recipe_id').order_by(
+    ).annotate(rows=Count('id'), keep_id=Min('id')).filter(rows__gt=1))
+    for duplicate in duplicates:
+        model.objects.filter(
+            user_id=duplicate['user_id'], recipe_id=duplicate['recipe_id']
+        ).exclude(id=duplicate['keep_id']).delete()
+    return duplicates
+
+
+def merge_duplicate_links(apps, schema_editor):
+    """Счётчики избранного и итоги списков покупок учитывали повторы,
+    поэтому для затронутых рецептов и пользователей они пересчитываются."""
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingCartTotal = apps.get_model('recipes', 'ShoppingCartTotal')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    with transaction.atomic():
+        for duplicate in delete_duplicates(Favorite):
+            Recipe.objects.filter(id=duplicate['recipe_id']).update(
+                favorites_count=Favorite.objects.filter(
+                    recipe_id=duplicate['recipe_id']).count())
+        for user_id in {duplicate['user_id']
+                        for duplicate in delete_duplicates(ShoppingCart)}:
+            ShoppingCartTotal.objects.filter(user_id=user_id).delete()
+            ShoppingCartTotal.objects.bulk_create(
+                ShoppingCartTotal(user_id=user_id,
+                                  ingredient_id=row['ingredient_id'],
+                                  total_amount=row['total'])
+                for row in IngredientRecipe.objects.filter(
+                    recipe__carts__user_id=user_id
+                ).values('ingredient_id').order_by().annotate(
+                    total=Sum('amount'))
+            )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0012_backfill_feeds'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_links,
+                             migrations.RunPython.noop),
+        AddUniqueConstraintConcurrently(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_user_recipe_favorite'),
+        ),
+        AddUniqueConstraintConcurrently(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_user_recipe_shopping_cart'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from .constants import REFERENCE_CACHE_TIMEOUT
+from .versions import get_version
+
+RENDERED_KEY = 'rendered:{version_key}:{version}'
+
+
+class ConditionalListMixin:
+    """Отдаёт список по ETag из версии справочника: 304 при совпадении,
+    иначе заранее отрендеренный JSON без повторной сериализации."""
+    version_key = None
+
+    def list(self, request, *args, **kwargs):
+        version = get_version(self.version_key)
+        etag = quote_etag(version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            if request.accepted_renderer.format != 'json':
+                response = super().list(request, *args, **kwargs)
+            else:
+                response = HttpResponse(
+                    self.get_rendered_list(request, version),
+                    content_type=request.accepted_renderer.media_type
+                )
+        response['ETag'] = etag
+        return response
+
+    def get_rendered_list(self, request, version):
+        key = RENDERED_KEY.format(version_key=self.version_key,
+                                  version=version)
+        content = cache.get(key)
+        if content is None:
+            serializer = self.get_serializer(
+                self.filter_queryset(self.get_queryset()), many=True)
+            content = request.accepted_renderer.render(serializer.data)
+            cache.set(key, content, REFERENCE_CACHE_TIMEOUT)
+        return content
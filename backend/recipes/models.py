@@ -1,6 +1,9 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.expressions import RawSQL, Window
+from django.db.models.functions import RowNumber
 
 from .constants import (AMOUNT_MAX_MESSAGE, AMOUNT_MAX_VALUE,
                         AMOUNT_MIN_MESSAGE, AMOUNT_MIN_VALUE,
@@ -23,13 +26,12 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
-
-    constraints = [
-        models.UniqueConstraint(
-            fields=['name', 'measurement_unit'],
-            name='unique_name_measurement_unit'
-        )
-    ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_name_measurement_unit'
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -51,6 +53,40 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                favorited=models.Value(
+                    False, output_field=models.BooleanField()),
+                in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField())
+            )
+        return self.annotate(
+            favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk'))),
+            in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')))
+        )
+
+    def latest_per_author(self, author_ids, limit):
+        if not author_ids:
+            return self.none()
+        ranked = self.model._default_manager.filter(
+            author_id__in=author_ids
+        ).annotate(row_number=Window(
+            RowNumber(),
+            partition_by=models.F('author_id'),
+            order_by=models.F('id').desc()
+        )).order_by().values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) AS ranked WHERE row_number <= %s',
+            (*params, limit)
+        ))
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='recipes',
@@ -62,6 +98,10 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         verbose_name='Изображение'
     )
+    image_derivatives_of = models.CharField(
+        max_length=100, blank=True,
+        verbose_name='Уменьшенные копии построены для'
+    )
     text = models.TextField(verbose_name='Текст')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -83,11 +123,23 @@ class Recipe(models.Model):
                                        verbose_name='В избранном')
     is_in_shopping_cart = models.BooleanField(default=False,
                                               verbose_name='В списке покупок')
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Дата изменения')
+    favorites_count = models.PositiveIntegerField(
+        default=0, verbose_name='В избранном у пользователей')
+    search_vector = SearchVectorField(null=True, editable=False,
+                                      verbose_name='Поисковый вектор')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['author', '-id'],
+                         name='recipe_author_id_desc'),
+        ]
 
     def __str__(self):
         return self.name
@@ -106,6 +158,14 @@ class IngredientRecipe(models.Model):
         MaxValueValidator(AMOUNT_MAX_VALUE, AMOUNT_MAX_MESSAGE)
     ])
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'ingredient'],
+                name='unique_recipe_ingredient'
+            )
+        ]
+
 
 class BaseFavoriteShopping(models.Model):
     user = models.ForeignKey(
@@ -120,12 +180,6 @@ class BaseFavoriteShopping(models.Model):
     class Meta:
         abstract = True
         ordering = ['id']
-        constraints = [
-            models.UniqueConstraint(
-                fields=['user', 'recipe'],
-                name='unique_user_recipe_favorite'
-            )
-        ]
 
 
 class Favorite(BaseFavoriteShopping):
@@ -134,6 +188,12 @@ class Favorite(BaseFavoriteShopping):
         default_related_name = 'favorite_recipe'
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_user_recipe_favorite'
+            )
+        ]
 
     def __str__(self):
         return (f'{self.user.username} добавил'
@@ -146,7 +206,77 @@ class ShoppingCart(BaseFavoriteShopping):
         default_related_name = 'carts'
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_user_recipe_shopping_cart'
+            )
+        ]
 
     def __str__(self):
         return (f'{self.user.username} добавил'
                 f'{self.recipe.name} в список покупок')
+
+
+class ShoppingCartTotal(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='cart_totals',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name='+',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Итог списка покупок'
+        verbose_name_plural = 'Итоги списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_ingredient_total'
+            )
+        ]
+
+    def __str__(self):
+        return (f'{self.user.username}: {self.ingredient.name} '
+                f'{self.total_amount}')
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='+',
+        verbose_name='Автор'
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        ordering = ['-recipe_id']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_user_recipe_feed'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe.name} в ленте {self.user.username}'
+
+
+def recipe_prefetches():
+    return (
+        models.Prefetch('tags', queryset=Tag.objects.order_by('id')),
+        models.Prefetch('ingredients_used',
+                        queryset=IngredientRecipe.objects.select_related(
+                            'ingredient').order_by('id')),
+    )
@@ -1,5 +1,73 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .constants import FEED_MAX_ENTRIES
+
+# Курсор DRF строится по первому полю сортировки, поэтому допускаются
+# только уникальные поля: при повторах значений страница дочитывается
+# через OFFSET.
+RECIPE_CURSOR_ORDERINGS = {
+    '-id': ('-id',),
+    'id': ('id',),
+}
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = RECIPE_CURSOR_ORDERINGS['-id']
+    ordering_query_param = 'ordering'
+
+    def get_ordering(self, request, queryset, view):
+        return RECIPE_CURSOR_ORDERINGS.get(
+            request.query_params.get(self.ordering_query_param),
+            self.ordering
+        )
+
+
+class FeedPagination(BasePagination):
+    """Постраничный вывод ленты по ключу: следующая страница содержит
+    рецепты старше последнего на текущей и не зависит от глубины."""
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    before_query_param = 'before'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), FEED_MAX_ENTRIES)
+
+    def get_before(self, request):
+        before = request.query_params.get(self.before_query_param)
+        if before is None:
+            return None
+        try:
+            return int(before)
+        except ValueError:
+            raise NotFound('Неверное значение before')
+
+    def paginate_ids(self, request, read):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        recipe_ids = read(self.get_before(request), page_size + 1)
+        self.page_ids = recipe_ids[:page_size]
+        self.has_next = len(recipe_ids) > page_size
+        return self.page_ids
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.before_query_param,
+                                   self.page_ids[-1])
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
@@ -0,0 +1,22 @@
+import json
+
+from rest_framework import renderers
+
+
+class BaseTextRenderer(renderers.BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, str)):
+            return data
+        return json.dumps(data, ensure_ascii=False)
+
+
+class PlainTextRenderer(BaseTextRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(BaseTextRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
@@ -0,0 +1,100 @@
+import re
+import threading
+from collections import defaultdict
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import Case, F, IntegerField, When
+
+from .constants import (RECIPE_SEARCH_VERSION_KEY, RECIPE_SEARCH_WEIGHTS,
+                        SEARCH_CONFIG)
+from .models import Recipe
+from .versions import bump_versions, get_version
+
+WORD = re.compile(r'\w+')
+
+
+def uses_postgres_search():
+    return connection.vendor == 'postgresql'
+
+
+def recipe_search_vector():
+    return (SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG))
+
+
+def update_search_vector(recipe_id):
+    if uses_postgres_search():
+        Recipe.objects.filter(pk=recipe_id).update(
+            search_vector=recipe_search_vector())
+    else:
+        recipe_search_index.invalidate()
+
+
+def tokenize(value):
+    return WORD.findall(value.casefold())
+
+
+class RecipeSearchIndex:
+    """Обратный индекс по названию и тексту рецептов в памяти процесса.
+    Используется вместо tsvector на базах без полнотекстового поиска."""
+
+    def __init__(self):
+        self.version = None
+        self.postings = {}
+        self.lock = threading.Lock()
+
+    def build(self):
+        postings = defaultdict(lambda: defaultdict(float))
+        for recipe in Recipe.objects.values('id', 'name', 'text').iterator():
+            for field, weight in RECIPE_SEARCH_WEIGHTS.items():
+                for token in tokenize(recipe[field]):
+                    postings[token][recipe['id']] += weight
+        self.postings = {token: dict(scores)
+                         for token, scores in postings.items()}
+
+    def ensure_current(self):
+        version = get_version(RECIPE_SEARCH_VERSION_KEY)
+        if version == self.version:
+            return
+        with self.lock:
+            if version != self.version:
+                self.build()
+                self.version = version
+
+    def invalidate(self):
+        bump_versions(RECIPE_SEARCH_VERSION_KEY)
+
+    def search(self, query):
+        self.ensure_current()
+        postings = self.postings
+        scores = None
+        for token in set(tokenize(query)):
+            matches = postings.get(token, {})
+            if scores is None:
+                scores = dict(matches)
+            else:
+                scores = {recipe_id: score + matches[recipe_id]
+                          for recipe_id, score in scores.items()
+                          if recipe_id in matches}
+        return sorted(scores or {},
+                      key=lambda recipe_id: (-scores[recipe_id], -recipe_id))
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, value):
+    if uses_postgres_search():
+        query = SearchQuery(value, config=SEARCH_CONFIG,
+                            search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-id')
+    recipe_ids = recipe_search_index.search(value)
+    return queryset.filter(id__in=recipe_ids).order_by(Case(
+        *[When(id=recipe_id, then=position)
+          for position, recipe_id in enumerate(recipe_ids)],
+        output_field=IntegerField()
+    ))
@@ -0,0 +1,211 @@
+import csv
+import io
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from PIL import Image
+
+from users.models import Subscriptions
+
+from .constants import (AMOUNT_MAX_VALUE, AMOUNT_MIN_VALUE, COOKING_MAX_VALUE,
+                        COOKING_MIN_VALUE, SEED_BATCH_SIZE,
+                        SEED_DISTINCT_ROUNDS, SEED_IMAGE_NAME, SEED_IMAGE_SIZE,
+                        SEED_INGREDIENTS_PER_RECIPE, SEED_TAGS)
+from .feed import rebuild_feeds
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCart, Tag)
+from .search import (recipe_search_index, recipe_search_vector,
+                     uses_postgres_search)
+
+User = get_user_model()
+
+COPY_NULL = '\\N'
+DEFAULT_INGREDIENTS_PATH = settings.BASE_DIR.parent / 'data' / (
+    'ingredients.json')
+
+
+def copy_objects(model, objects):
+    fields = [field for field in model._meta.concrete_fields
+              if not field.primary_key]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for obj in objects:
+        row = []
+        for field in fields:
+            value = field.get_db_prep_save(field.pre_save(obj, True),
+                                           connection)
+            row.append(COPY_NULL if value is None else value)
+        writer.writerow(row)
+    buffer.seek(0)
+    columns = ', '.join(connection.ops.quote_name(field.column)
+                        for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {model._meta.db_table} ({columns}) FROM STDIN '
+            f"WITH (FORMAT csv, NULL '{COPY_NULL}')",
+            buffer
+        )
+
+
+def bulk_insert(model, objects, ignore_conflicts=True):
+    """Вставляет объекты пачками, не собирая их все в памяти. Если
+    конфликтов быть не может, на PostgreSQL пачки загружаются через COPY."""
+    use_copy = not ignore_conflicts and connection.vendor == 'postgresql'
+    objects = iter(objects)
+    inserted = 0
+    while True:
+        batch = list(islice(objects, SEED_BATCH_SIZE))
+        if not batch:
+            return inserted
+        if use_copy:
+            copy_objects(model, batch)
+        else:
+            model.objects.bulk_create(batch,
+                                      ignore_conflicts=ignore_conflicts)
+        inserted += len(batch)
+
+
+class PowerLaw:
+    """Выбирает элементы с вероятностью, обратно пропорциональной
+    рангу в степени exponent: немного популярных и длинный хвост."""
+
+    def __init__(self, rng, items, exponent):
+        self.rng = rng
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(self.items) + 1)))
+
+    def pick(self, count=1):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights,
+                                k=count)
+
+    def pick_distinct(self, count, exclude=()):
+        count = min(count, len(self.items) - len(exclude))
+        chosen = {}
+        for _ in range(SEED_DISTINCT_ROUNDS):
+            if len(chosen) >= count:
+                break
+            for item in self.pick(count - len(chosen)):
+                if item not in exclude:
+                    chosen.setdefault(item)
+        return list(chosen)
+
+
+def ensure_ingredients(path=DEFAULT_INGREDIENTS_PATH):
+    if not Ingredient.objects.exists():
+        call_command('load_ingredients', str(path))
+    return list(Ingredient.objects.order_by('id').values_list(
+        'id', flat=True))
+
+
+def ensure_tags():
+    for name, color, slug in SEED_TAGS:
+        Tag.objects.get_or_create(
+            slug=slug, defaults={'name': name, 'color': color})
+    return list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+
+def ensure_image():
+    if not default_storage.exists(SEED_IMAGE_NAME):
+        buffer = io.BytesIO()
+        Image.new('RGB', SEED_IMAGE_SIZE, 'orange').save(buffer, 'PNG')
+        default_storage.save(SEED_IMAGE_NAME, ContentFile(buffer.getvalue()))
+    return SEED_IMAGE_NAME
+
+
+def seed_users(prefix, count):
+    """Пароли не хешируются: у пользователей неиспользуемый пароль,
+    уникальный, как того требует модель."""
+    bulk_insert(User, (
+        User(username=f'{prefix}{number}',
+             email=f'{prefix}{number}@example.com',
+             first_name='Пользователь', last_name=str(number),
+             password=make_password(None))
+        for number in range(count)
+    ))
+    return list(User.objects.filter(
+        username__startswith=prefix).order_by('id').values_list(
+        'id', flat=True))
+
+
+def seed_recipes(rng, author_ids, count, tag_ids, ingredient_ids):
+    image = ensure_image()
+    last_id = Recipe.objects.order_by('-id').values_list(
+        'id', flat=True).first() or 0
+    bulk_insert(Recipe, (
+        Recipe(author_id=rng.choice(author_ids),
+               name=f'Рецепт {number}',
+               text=f'Описание рецепта {number}',
+               image=image,
+               cooking_time=rng.randint(COOKING_MIN_VALUE,
+                                        COOKING_MAX_VALUE))
+        for number in range(count)
+    ))
+    recipe_ids = list(Recipe.objects.filter(id__gt=last_id).order_by(
+        'id').values_list('id', flat=True))
+    bulk_insert(IngredientRecipe, (
+        IngredientRecipe(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                         amount=rng.randint(AMOUNT_MIN_VALUE,
+                                            AMOUNT_MAX_VALUE))
+        for recipe_id in recipe_ids
+        for ingredient_id in rng.sample(
+            ingredient_ids,
+            min(len(ingredient_ids),
+                rng.randint(*SEED_INGREDIENTS_PER_RECIPE)))
+    ))
+    bulk_insert(Recipe.tags.through, (
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rng.sample(tag_ids, rng.randint(1, len(tag_ids)))
+    ))
+    return recipe_ids
+
+
+def seed_pairs(rng, model, fields, left_ids, right_ids, count,
+               allow_same=True):
+    left_field, right_field = fields
+    seen = set()
+    attempts = count * 2
+    while len(seen) < count and attempts:
+        attempts -= 1
+        pair = (rng.choice(left_ids), rng.choice(right_ids))
+        if allow_same or pair[0] != pair[1]:
+            seen.add(pair)
+    return bulk_insert(model, (
+        model(**{left_field: left, right_field: right})
+        for left, right in seen
+    ))
+
+
+def seed_activity(rng, user_ids, recipe_ids, favorites, carts,
+                  subscriptions):
+    return {
+        'favorites': seed_pairs(rng, Favorite, ('user_id', 'recipe_id'),
+                                user_ids, recipe_ids, favorites),
+        'carts': seed_pairs(rng, ShoppingCart, ('user_id', 'recipe_id'),
+                            user_ids, recipe_ids, carts),
+        'subscriptions': seed_pairs(
+            rng, Subscriptions, ('follower_id', 'following_id'),
+            user_ids, user_ids, subscriptions, allow_same=False),
+    }
+
+
+def refresh_denormalized(stdout=None):
+    """Восстанавливает то, что при обычной записи поддерживают сигналы:
+    счётчики, ленты подписчиков, итоги списков покупок и поисковый
+    индекс."""
+    call_command('recount', stdout=stdout)
+    rebuild_feeds()
+    call_command('rebuild_shopping_totals', stdout=stdout)
+    if uses_postgres_search():
+        Recipe.objects.filter(search_vector=None).update(
+            search_vector=recipe_search_vector())
+    else:
+        recipe_search_index.invalidate()
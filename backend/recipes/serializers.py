@@ -5,22 +5,29 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
 from django.core.files.base import ContentFile
 from django.db import transaction
-from django.shortcuts import get_object_or_404
+from django.db.models import prefetch_related_objects
 from djoser.serializers import TokenCreateSerializer, UserSerializer
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import (TokenObtainPairSerializer,
+                                                  TokenRefreshSerializer,
+                                                  TokenVerifySerializer)
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
 
 from users.models import Subscriptions
 
-from .constants import (AMOUNT_MIN_VALUE,
-                        AMOUNT_MIN_MESSAGE,
-                        AMOUNT_MAX_VALUE,
-                        AMOUNT_MAX_MESSAGE,
-                        COOKING_MIN_VALUE,
-                        COOKING_MIN_MESSAGE,
-                        COOKING_MAX_VALUE,
-                        COOKING_MAX_MESSAGE)
+from .authentication import check_not_revoked, get_auth_version, revoke_token
+from .constants import (AMOUNT_MAX_MESSAGE, AMOUNT_MAX_VALUE,
+                        AMOUNT_MIN_MESSAGE, AMOUNT_MIN_VALUE,
+                        AUTH_VERSION_CLAIM, BULK_MAX_IDS, COOKING_MAX_MESSAGE,
+                        COOKING_MAX_VALUE, COOKING_MIN_MESSAGE,
+                        COOKING_MIN_VALUE)
+from .fragments import get_fragments
+from .images import derivative_url
+from .loaders import SubscriptionLoader
 from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingCartTotal, Tag, recipe_prefetches)
+from .shopping_cart import add_to_totals, subtract_from_totals
 from .validators import unique_ingredient, unique_tag
 
 User = get_user_model()
@@ -49,6 +56,14 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class FoodgramUserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        users = data.all() if hasattr(data, 'all') else data
+        SubscriptionLoader.for_request(self.context['request']).prime(
+            user.id for user in users)
+        return super().to_representation(users)
+
+
 class FoodgramUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
@@ -56,6 +71,8 @@ class FoodgramUserSerializer(UserSerializer):
         model = User
         fields = ('email', 'id', 'username', 'first_name',
                   'last_name', 'password', 'is_subscribed')
+        extra_kwargs = {'password': {'write_only': True}}
+        list_serializer_class = FoodgramUserListSerializer
 
     def get_fields(self):
         fields = super().get_fields()
@@ -64,15 +81,8 @@ class FoodgramUserSerializer(UserSerializer):
         return fields
 
     def get_is_subscribed(self, obj):
-        return (self.context['request'].user.is_authenticated
-                and Subscriptions.objects.filter(
-                    following=self.context['request'].user,
-                    follower=obj).exists())
-
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation.pop('password')
-        return representation
+        return SubscriptionLoader.for_request(
+            self.context['request']).load(obj.id)
 
     def create(self, validated_data):
         password = make_password(validated_data.pop('password'))
@@ -124,6 +134,20 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         return value
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = list(data.all() if hasattr(data, 'all') else data)
+        SubscriptionLoader.for_request(self.context['request']).prime(
+            recipe.author_id for recipe in recipes)
+        if self.child.is_short_representation():
+            return super().to_representation(recipes)
+        fragments = get_fragments(recipes,
+                                  self.context['request'].get_host(),
+                                  self.child.build_fragments)
+        return [self.child.with_viewer_fields(fragments[recipe.id], recipe)
+                for recipe in recipes]
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     author = FoodgramUserSerializer(read_only=True)
     tags = serializers.SlugRelatedField(queryset=Tag.objects.all(),
@@ -133,6 +157,9 @@ class RecipeSerializer(serializers.ModelSerializer):
     ingredients = IngredientRecipeSerializer(many=True,
                                              source='ingredients_used')
     image = Base64ImageField(required=True)
+    image_thumbnail = serializers.SerializerMethodField()
+    image_card = serializers.SerializerMethodField()
+    image_full = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -140,18 +167,36 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients',
-            'name', 'image', 'text', 'cooking_time',
-            'is_favorited', 'is_in_shopping_cart'
+            'name', 'image', 'image_thumbnail', 'image_card', 'image_full',
+            'text', 'cooking_time', 'is_favorited', 'is_in_shopping_cart'
         )
         read_only_fields = ('id', 'author', 'is_favorited',
                             'is_in_shopping_cart')
+        list_serializer_class = RecipeListSerializer
+
+    def get_image_url(self, obj, size):
+        return self.context['request'].build_absolute_uri(
+            derivative_url(obj, size))
+
+    def get_image_thumbnail(self, obj):
+        return self.get_image_url(obj, 'thumbnail')
+
+    def get_image_card(self, obj):
+        return self.get_image_url(obj, 'card')
+
+    def get_image_full(self, obj):
+        return self.get_image_url(obj, 'full')
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'favorited'):
+            return obj.favorited
         return Favorite.objects.filter(
             user__id=self.context['request'].user.id,
             recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'in_shopping_cart'):
+            return obj.in_shopping_cart
         return ShoppingCart.objects.filter(
             user__id=self.context['request'].user.id,
             recipe=obj).exists()
@@ -201,33 +246,75 @@ class RecipeSerializer(serializers.ModelSerializer):
         instance.tags.set(tags)
         return instance
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients_used')
         tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.ingredients.clear()
         instance.tags.set(tags)
-        super().update(instance, validated_data)
-        ingredient_list = []
-        for ingredient in ingredients:
-            current_ingredient = get_object_or_404(
-                Ingredient,
-                name=ingredient.get('ingredient')
-            )
-            amount = ingredient.get('amount')
-            ingredient_list.append(IngredientRecipe(
-                recipe=instance,
-                ingredient=current_ingredient,
-                amount=amount
-            ))
-        IngredientRecipe.objects.bulk_create(ingredient_list)
-        instance.save()
-        return instance
-
-    def to_representation(self, instance):
+        self.update_ingredients(instance, ingredients)
+        return super().update(instance, validated_data)
+
+    def update_ingredients(self, instance, ingredients):
+        current = {ingredient_recipe.ingredient_id: ingredient_recipe
+                   for ingredient_recipe in instance.ingredients_used.all()}
+        requested = {ingredient['ingredient'].id: ingredient['amount']
+                     for ingredient in ingredients}
+        to_delete = [ingredient_recipe.id
+                     for ingredient_id, ingredient_recipe in current.items()
+                     if ingredient_id not in requested]
+        to_update = []
+        to_create = []
+        for ingredient_id, amount in requested.items():
+            ingredient_recipe = current.get(ingredient_id)
+            if ingredient_recipe is None:
+                to_create.append(IngredientRecipe(
+                    recipe=instance, ingredient_id=ingredient_id,
+                    amount=amount))
+            elif ingredient_recipe.amount != amount:
+                ingredient_recipe.amount = amount
+                to_update.append(ingredient_recipe)
+        if not (to_delete or to_update or to_create):
+            return
+        carts = ShoppingCart.objects.filter(recipe=instance)
+        subtract_from_totals(carts)
+        if to_delete:
+            IngredientRecipe.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            IngredientRecipe.objects.bulk_update(to_update, ('amount',))
+        if to_create:
+            IngredientRecipe.objects.bulk_create(to_create)
+        add_to_totals(carts)
+
+    def is_short_representation(self):
         path = self.context['request'].path
         parts_of_path = ['/favorite/', '/subscr', '/shop']
-        if any(parts in path for parts in parts_of_path):
+        return any(parts in path for parts in parts_of_path)
+
+    def build_fragments(self, recipes):
+        prefetch_related_objects(recipes, *recipe_prefetches())
+        fragments = {}
+        for recipe in recipes:
+            fragment = super().to_representation(recipe)
+            fragment['tags'] = TagSerializer(recipe.tags, many=True).data
+            fragment['author']['is_subscribed'] = None
+            fragment['is_favorited'] = None
+            fragment['is_in_shopping_cart'] = None
+            fragments[recipe.id] = fragment
+        return fragments
+
+    def with_viewer_fields(self, fragment, instance):
+        representation = fragment.copy()
+        representation['author'] = fragment['author'].copy()
+        representation['author']['is_subscribed'] = (
+            SubscriptionLoader.for_request(self.context['request']).load(
+                instance.author_id))
+        representation['is_favorited'] = self.get_is_favorited(instance)
+        representation['is_in_shopping_cart'] = (
+            self.get_is_in_shopping_cart(instance))
+        return representation
+
+    def to_representation(self, instance):
+        if self.is_short_representation():
             short_representation = super().to_representation(instance)
             short_representation.pop('tags')
             short_representation.pop('author')
@@ -236,23 +323,33 @@ class RecipeSerializer(serializers.ModelSerializer):
             short_representation.pop('is_in_shopping_cart')
             short_representation.pop('text')
             return short_representation
-        full_representation = super().to_representation(instance)
-        full_representation['tags'] = TagSerializer(
-            instance.tags, many=True).data
-        return full_representation
+        fragments = get_fragments([instance],
+                                  self.context['request'].get_host(),
+                                  self.build_fragments)
+        return self.with_viewer_fields(fragments[instance.id], instance)
+
+
+class RecipeShortSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'name', 'image', 'cooking_time')
 
 
 class SubscriptionsSerializer(UserSerializer):
-    recipes = RecipeSerializer(many=True)
-    recipes_count = serializers.SerializerMethodField()
+    is_subscribed = serializers.SerializerMethodField()
+    recipes = RecipeShortSerializer(many=True, source='latest_recipes')
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name',
                   'last_name', 'is_subscribed', 'recipes', 'recipes_count')
+        read_only_fields = ('recipes_count',)
+        list_serializer_class = FoodgramUserListSerializer
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
+    def get_is_subscribed(self, obj):
+        return SubscriptionLoader.for_request(
+            self.context['request']).load(obj.id)
 
 
 class SubscriptionsPostSerializer(serializers.ModelSerializer):
@@ -288,6 +385,18 @@ class ShoppigCartSerializer(serializers.ModelSerializer):
         return data
 
 
+class ShoppingCartTotalSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit')
+    amount = serializers.IntegerField(source='total_amount')
+
+    class Meta:
+        model = ShoppingCartTotal
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -301,3 +410,46 @@ class FavoriteSerializer(serializers.ModelSerializer):
                                    recipe=data['recipe'].id).exists():
             raise serializers.ValidationError('Этот рецепт уже в избранном!')
         return data
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=BULK_MAX_IDS
+    )
+
+
+class FoodgramTokenObtainPairSerializer(TokenObtainPairSerializer):
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[AUTH_VERSION_CLAIM] = get_auth_version(user.id)
+        return token
+
+
+class FoodgramTokenRefreshSerializer(TokenRefreshSerializer):
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        check_not_revoked(refresh)
+        data = super().validate(attrs)
+        revoke_token(refresh)
+        return data
+
+
+class FoodgramTokenVerifySerializer(TokenVerifySerializer):
+
+    def validate(self, attrs):
+        check_not_revoked(UntypedToken(attrs['token']))
+        return {}
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, value):
+        try:
+            return RefreshToken(value)
+        except TokenError as error:
+            raise serializers.ValidationError(str(error))
@@ -0,0 +1,137 @@
+import csv
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .constants import SHOPPING_CART_CACHE_TIMEOUT
+from .models import IngredientRecipe, ShoppingCart, ShoppingCartTotal
+from .versions import bump_versions, get_version
+
+VERSION_KEY = 'shopping_cart_version:{user_id}'
+CONTENT_KEY = 'shopping_cart:{user_id}:{version}:{export_format}'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def get_cart_version(user_id):
+    return get_version(VERSION_KEY.format(user_id=user_id))
+
+
+def invalidate_carts(user_ids):
+    bump_versions(*[VERSION_KEY.format(user_id=user_id)
+                    for user_id in user_ids])
+
+
+def add_to_totals(carts):
+    """Прибавляет ингредиенты рецептов из записей списков покупок carts
+    к итогам их владельцев. Записи уже должны быть в базе."""
+    sql, params = carts.values('id').query.sql_with_params()
+    totals = ShoppingCartTotal._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {totals} (user_id, ingredient_id, total_amount) '
+            f'SELECT cart.user_id, item.ingredient_id, SUM(item.amount) '
+            f'FROM {ShoppingCart._meta.db_table} AS cart '
+            f'JOIN {IngredientRecipe._meta.db_table} AS item '
+            f'ON item.recipe_id = cart.recipe_id '
+            f'WHERE cart.id IN ({sql}) '
+            f'GROUP BY cart.user_id, item.ingredient_id '
+            f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+            f'SET total_amount = {totals}.total_amount '
+            f'+ EXCLUDED.total_amount',
+            params
+        )
+
+
+def subtract_from_totals(carts):
+    """Вычитает ингредиенты рецептов из записей carts из итогов их
+    владельцев. Вызывается, пока записи и состав рецептов ещё в базе."""
+    amounts = IngredientRecipe.objects.filter(
+        recipe__carts__in=carts,
+        recipe__carts__user_id=OuterRef('user_id'),
+        ingredient_id=OuterRef('ingredient_id')
+    ).order_by().values('ingredient_id').annotate(
+        total=Sum('amount')).values('total')
+    totals = ShoppingCartTotal.objects.filter(
+        user_id__in=carts.values('user_id'),
+        ingredient_id__in=IngredientRecipe.objects.filter(
+            recipe_id__in=carts.values('recipe_id')).values('ingredient_id')
+    )
+    totals.update(total_amount=Greatest(
+        F('total_amount') - Coalesce(Subquery(amounts), 0), 0))
+    totals.filter(total_amount=0).delete()
+
+
+def rebuild_totals(users):
+    ShoppingCartTotal.objects.filter(user__in=users).delete()
+    add_to_totals(ShoppingCart.objects.filter(user__in=users))
+
+
+def get_cart_ingredients(user):
+    return ShoppingCartTotal.objects.filter(
+        user=user
+    ).values(
+        'ingredient_id', 'ingredient__name', 'ingredient__measurement_unit'
+    ).order_by(
+        'ingredient__name'
+    ).annotate(ingredient_amount=F('total_amount'))
+
+
+def render_txt(ingredients):
+    yield 'Список покупок:\n'
+    for ingredient in ingredients:
+        name = ingredient['ingredient__name']
+        unit = ingredient['ingredient__measurement_unit']
+        amount = ingredient['ingredient_amount']
+        yield f'\n{name} - {amount}, {unit}'
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in ingredients:
+        yield writer.writerow((ingredient['ingredient__name'],
+                               ingredient['ingredient__measurement_unit'],
+                               ingredient['ingredient_amount']))
+
+
+def render_json(ingredients):
+    separator = '['
+    for ingredient in ingredients:
+        yield separator + json.dumps({
+            'name': ingredient['ingredient__name'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+            'amount': ingredient['ingredient_amount'],
+        }, ensure_ascii=False)
+        separator = ', '
+    yield ']' if separator == ', ' else '[]'
+
+
+EXPORT_FORMATS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'json': render_json,
+}
+
+
+def stream_shopping_cart(user, export_format):
+    key = CONTENT_KEY.format(user_id=user.id,
+                             version=get_cart_version(user.id),
+                             export_format=export_format)
+    content = cache.get(key)
+    if content is not None:
+        yield content
+        return
+    chunks = []
+    ingredients = get_cart_ingredients(user).iterator()
+    for chunk in EXPORT_FORMATS[export_format](ingredients):
+        chunk = chunk.encode()
+        chunks.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(chunks), SHOPPING_CART_CACHE_TIMEOUT)
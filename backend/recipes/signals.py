@@ -0,0 +1,149 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.models import Subscriptions
+
+from .authentication import bump_auth_version
+from .constants import FEED_FANOUT_MAX_FOLLOWERS, TAG_VERSION_KEY
+from .counters import change_counter
+from .feed import (add_author_to_feed, fan_out_author, fan_out_recipe,
+                   remove_author_from_feed, schedule_fan_out)
+from .fragments import bump_author_version, bump_recipe_versions
+from .images import schedule_derivatives
+from .ingredient_index import ingredient_index
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCart, Tag)
+from .search import recipe_search_index, update_search_vector
+from .shopping_cart import (add_to_totals, invalidate_carts,
+                            subtract_from_totals)
+from .versions import bump_versions
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_carts([instance.user_id]))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_added(sender, instance, created, **kwargs):
+    if created:
+        add_to_totals(ShoppingCart.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_removed(sender, instance, **kwargs):
+    subtract_from_totals(ShoppingCart.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_changed(sender, instance, **kwargs):
+    if instance.image and (
+            instance.image_derivatives_of != instance.image.name):
+        schedule_derivatives(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, created, **kwargs):
+    if created:
+        return
+    user_ids = list(ShoppingCart.objects.filter(
+        recipe=instance).values_list('user_id', flat=True))
+    if user_ids:
+        transaction.on_commit(lambda: invalidate_carts(user_ids))
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_versions(TAG_VERSION_KEY))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+        schedule_fan_out(fan_out_recipe, instance.pk, instance.author_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+    transaction.on_commit(recipe_search_index.invalidate)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_text_changed(sender, instance, update_fields, **kwargs):
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        update_search_vector(instance.pk)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Subscriptions)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.following_id, 'followers_count', 1)
+        add_author_to_feed(instance.follower_id, instance.following)
+
+
+@receiver(post_delete, sender=Subscriptions)
+def subscription_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.following_id, 'followers_count', -1)
+    remove_author_from_feed(instance.follower_id, instance.following_id)
+    author_id = instance.following_id
+    if User.objects.filter(
+            pk=author_id, followers_count=FEED_FANOUT_MAX_FOLLOWERS).exists():
+        schedule_fan_out(fan_out_author, author_id)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=IngredientRecipe)
+def recipe_fragment_changed(sender, instance, **kwargs):
+    recipe_id = instance.pk if sender is Recipe else instance.recipe_id
+    transaction.on_commit(lambda: bump_recipe_versions([recipe_id]))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, pk_set, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    recipe_ids = list(pk_set or ()) if reverse else [instance.pk]
+    transaction.on_commit(lambda: bump_recipe_versions(recipe_ids))
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, update_fields, **kwargs):
+    if update_fields is None or {
+            'email', 'username', 'first_name', 'last_name'
+    } & set(update_fields):
+        transaction.on_commit(lambda: bump_author_version(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def user_credentials_changed(sender, instance, update_fields, **kwargs):
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        transaction.on_commit(lambda: bump_auth_version(instance.pk))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_auth_version(instance.user_id))
@@ -0,0 +1,99 @@
+import base64
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APIClient, APITestCase
+
+from recipes.models import Ingredient, Tag
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+# Тесты не зависят от Redis: у каждого кеша свой LocMemCache.
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': alias}
+    for alias in settings.CACHES
+}
+
+
+def make_image(color='red', size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+# Копии изображений не строятся в фоновом потоке: тесты вызывают
+# build_derivatives явно. Ленты раскладываются сразу после фиксации.
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=TEST_CACHES,
+                   IMAGE_DERIVATIVES_BACKGROUND=False,
+                   FEED_FANOUT_BACKGROUND=False)
+class FoodgramAPITestCase(APITestCase):
+    """Общие данные тестов API: автор, пользователь, теги и ингредиенты.
+    Кеши в памяти очищаются перед каждым тестом, файлы пишутся во
+    временный каталог."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.user = cls.create_user('user')
+        cls.tags = [Tag.objects.create(name=f'Тег {number}',
+                                       color=f'#00000{number}',
+                                       slug=f'tag{number}')
+                    for number in range(2)]
+        cls.ingredients = [Ingredient.objects.create(
+            name=f'Ингредиент {number}', measurement_unit='г'
+        ) for number in range(4)]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create_user(
+            email=f'{username}@example.com', password=f'{username}-pass',
+            username=username, first_name='Имя', last_name='Фамилия')
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.anon_client = APIClient()
+        self.author_client = self.client_for(self.author)
+        self.user_client = self.client_for(self.user)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def recipe_data(self, amounts, **fields):
+        return {
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient, amount in zip(self.ingredients, amounts)
+                if amount
+            ],
+            'tags': [self.tags[0].id],
+            'image': make_image(),
+            'name': 'Суп',
+            'text': 'Сварить',
+            'cooking_time': 10,
+            **fields,
+        }
+
+    def create_recipe(self, amounts=(100,), **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.author_client.post(
+                '/api/recipes/', self.recipe_data(amounts, **fields),
+                format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
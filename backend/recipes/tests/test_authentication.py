@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import override_settings
+from django.urls import include, path
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from backend.urls import urlpatterns as project_urlpatterns
+from recipes.authentication import (CachedTokenAuthentication,
+                                    FoodgramJWTAuthentication)
+from recipes.urls import jwt_urls
+
+from .base import FoodgramAPITestCase
+
+# Маршруты JWT подключаются только при AUTH_MODE=jwt.
+urlpatterns = [*project_urlpatterns, path('api/auth/', include(jwt_urls))]
+
+
+class CachedTokenAuthenticationTests(FoodgramAPITestCase):
+
+    def test_auth_is_token_on_cache_hit(self):
+        token = Token.objects.create(user=self.user)
+        authentication = CachedTokenAuthentication()
+        for _ in range(2):
+            user, auth = authentication.authenticate_credentials(token.key)
+            self.assertEqual(user, self.user)
+            self.assertIsInstance(auth, Token)
+            self.assertEqual(auth.key, token.key)
+            self.assertEqual(auth.user, self.user)
+
+    def test_token_login(self):
+        token = Token.objects.create(user=self.user)
+        self.anon_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        for _ in range(2):
+            response = self.anon_client.get('/api/users/me/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['id'], self.user.id)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class JWTAuthenticationTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Классы аутентификации читаются из настроек при импорте DRF.
+        patcher = mock.patch.object(APIView, 'authentication_classes', [
+            FoodgramJWTAuthentication, CachedTokenAuthentication])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        response = self.anon_client.post('/api/auth/jwt/create/', {
+            'email': self.user.email, 'password': 'user-pass'})
+        self.assertEqual(response.status_code, 200)
+        self.access = response.data['access']
+        self.refresh = response.data['refresh']
+
+    def me(self, access):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client.get('/api/users/me/')
+
+    def refresh_pair(self, refresh):
+        return self.anon_client.post('/api/auth/jwt/refresh/',
+                                     {'refresh': refresh})
+
+    def test_access_token_login(self):
+        response = self.me(self.access)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.user.id)
+
+    def test_logout_revokes_both_tokens(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        response = client.post('/api/auth/jwt/logout/',
+                               {'refresh': self.refresh})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.me(self.access).status_code, 401)
+        self.assertEqual(self.refresh_pair(self.refresh).status_code, 401)
+
+    def test_refresh_token_reuse_rejected(self):
+        response = self.refresh_pair(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.me(response.data['access']).status_code, 200)
+        self.assertEqual(self.refresh_pair(self.refresh).status_code, 401)
+        self.assertEqual(
+            self.refresh_pair(response.data['refresh']).status_code, 200)
+
+    def test_password_change_revokes_tokens(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/users/set_password/', {
+                'current_password': 'user-pass',
+                'new_password': 'new-user-pass'})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.me(self.access).status_code, 401)
+        self.assertEqual(self.refresh_pair(self.refresh).status_code, 401)
+
+    def test_revocation_survives_cache_eviction(self):
+        self.anon_client.post('/api/auth/jwt/logout/',
+                              {'refresh': self.refresh})
+        cache = caches['default']
+        cache.set_many({f'filler:{number}': number
+                        for number in range(5000)})
+        self.assertEqual(self.refresh_pair(self.refresh).status_code, 401)
@@ -0,0 +1,83 @@
+from unittest import mock
+
+from recipes import bulk
+from recipes.models import Favorite, ShoppingCart, ShoppingCartTotal
+from users.models import Subscriptions
+
+from .base import FoodgramAPITestCase
+
+
+class BulkEndpointsTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_ids = [self.create_recipe((100, 50),
+                                              name=f'Суп {number}')
+                           for number in range(3)]
+
+    def post(self, url, ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.user_client.post(url, {'ids': ids}, format='json')
+
+    def test_favorite_statuses(self):
+        Favorite.objects.create(user=self.user, recipe_id=self.recipe_ids[0])
+        response = self.post('/api/recipes/favorite/', [
+            self.recipe_ids[0], self.recipe_ids[1], self.recipe_ids[1],
+            9876])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(result['id'], result['status'])
+             for result in response.data['results']],
+            [(self.recipe_ids[0], bulk.EXISTS),
+             (self.recipe_ids[1], bulk.ADDED),
+             (9876, bulk.NOT_FOUND)])
+        self.assertEqual(
+            self.user_client.get(
+                f'/api/recipes/{self.recipe_ids[1]}/'
+            ).data['is_favorited'], True)
+
+    def test_nothing_added(self):
+        Favorite.objects.create(user=self.user, recipe_id=self.recipe_ids[0])
+        response = self.post('/api/recipes/favorite/', [self.recipe_ids[0]])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary'], {bulk.EXISTS: 1})
+
+    def test_subscribe_self(self):
+        response = self.post('/api/users/subscribe/',
+                             [self.user.id, self.author.id])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['summary'],
+                         {bulk.FORBIDDEN: 1, bulk.ADDED: 1})
+        self.assertTrue(Subscriptions.objects.filter(
+            follower=self.user, following=self.author).exists())
+
+    def test_shopping_cart_totals(self):
+        response = self.post('/api/recipes/shopping_cart/', self.recipe_ids)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            dict(ShoppingCartTotal.objects.filter(
+                user=self.user).values_list('ingredient_id',
+                                            'total_amount')),
+            {self.ingredients[0].id: 300, self.ingredients[1].id: 150})
+
+    def test_concurrent_add_is_not_counted(self):
+        """Связь, добавленная параллельным запросом после проверки
+        существования, не считается добавленной и не попадает в итоги."""
+        insert_links = bulk.insert_links
+
+        def add_concurrently(*args):
+            ShoppingCart.objects.create(user=self.user,
+                                        recipe_id=self.recipe_ids[0])
+            return insert_links(*args)
+
+        with mock.patch('recipes.bulk.insert_links', add_concurrently):
+            response = self.post('/api/recipes/shopping_cart/',
+                                 self.recipe_ids[:2])
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            [bulk.EXISTS, bulk.ADDED])
+        self.assertEqual(
+            dict(ShoppingCartTotal.objects.filter(
+                user=self.user).values_list('ingredient_id',
+                                            'total_amount')),
+            {self.ingredients[0].id: 200, self.ingredients[1].id: 100})
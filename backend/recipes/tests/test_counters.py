@@ -0,0 +1,54 @@
+import io
+
+from django.core.management import call_command
+
+from recipes.models import Favorite, Recipe
+from users.models import Subscriptions
+
+from .base import FoodgramAPITestCase
+
+
+class CountersTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_id = self.create_recipe()
+
+    def counts(self):
+        self.author.refresh_from_db()
+        recipe = Recipe.objects.get(id=self.recipe_id)
+        return (self.author.recipes_count, self.author.followers_count,
+                recipe.favorites_count)
+
+    def test_counters_follow_create_and_delete(self):
+        self.user_client.post(f'/api/recipes/{self.recipe_id}/favorite/')
+        self.user_client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.counts(), (1, 1, 1))
+        self.user_client.delete(f'/api/recipes/{self.recipe_id}/favorite/')
+        self.user_client.delete(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.counts(), (1, 0, 0))
+        second_id = self.create_recipe(name='Каша')
+        self.assertEqual(self.counts()[0], 2)
+        self.author_client.delete(f'/api/recipes/{second_id}/')
+        self.assertEqual(self.counts()[0], 1)
+
+    def test_counters_do_not_go_negative(self):
+        Favorite.objects.create(user=self.user, recipe_id=self.recipe_id)
+        Recipe.objects.filter(id=self.recipe_id).update(favorites_count=0)
+        Favorite.objects.get(user=self.user).delete()
+        self.assertEqual(self.counts()[2], 0)
+
+    def test_recount_repairs_drift(self):
+        Favorite.objects.create(user=self.user, recipe_id=self.recipe_id)
+        Subscriptions.objects.create(follower=self.user,
+                                     following=self.author)
+        type(self.author).objects.filter(id=self.author.id).update(
+            recipes_count=7, followers_count=0)
+        Recipe.objects.filter(id=self.recipe_id).update(favorites_count=5)
+        out = io.StringIO()
+        call_command('recount', stdout=out)
+        self.assertEqual(self.counts(), (1, 1, 1))
+        self.assertIn('recipe.favorites_count: исправлено 1', out.getvalue())
+        out = io.StringIO()
+        call_command('recount', stdout=out)
+        self.assertNotIn('исправлено 1', out.getvalue())
@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve
+
+from backend.db_router import (PIN_COOKIE, ReplicaPinningMiddleware,
+                               ReplicaRouter, RoutingState, current_state)
+from recipes.models import Recipe
+
+from .base import TEST_CACHES
+
+REPLICAS = ['replica_0', 'replica_1']
+TOKEN = 'Token 0123456789'
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS, CACHES=TEST_CACHES,
+                   REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTests(TestCase):
+    """Решения маршрутизатора при основной базе и двух репликах. Тест
+    идёт в транзакции, поэтому флаг in_atomic_block подменяется там,
+    где проверяется выбор реплики."""
+
+    def setUp(self):
+        caches['state'].clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def request(self, path='/api/recipes/', method='get', **extra):
+        request = getattr(self.factory, method)(path, **extra)
+        request.resolver_match = resolve(path)
+        return request
+
+    def read(self, request, in_transaction=False):
+        token = current_state.set(RoutingState(request))
+        try:
+            with mock.patch.object(connections[DEFAULT_DB_ALIAS],
+                                   'in_atomic_block', in_transaction):
+                return self.router.db_for_read(Recipe)
+        finally:
+            current_state.reset(token)
+
+    def test_replicated_read_goes_to_replica(self):
+        aliases = {self.read(self.request()) for _ in range(50)}
+        self.assertEqual(aliases, set(REPLICAS))
+
+    def test_primary_reads(self):
+        self.assertEqual(self.router.db_for_read(Recipe), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.read(self.request('/api/metrics')),
+                         DEFAULT_DB_ALIAS)
+        self.assertEqual(self.read(self.request(), in_transaction=True),
+                         DEFAULT_DB_ALIAS)
+        self.assertEqual(self.read(self.request(method='post')),
+                         DEFAULT_DB_ALIAS)
+
+    def test_write_pins_client_to_primary(self):
+        def write(request):
+            self.router.db_for_write(Recipe)
+            return HttpResponse()
+
+        middleware = ReplicaPinningMiddleware(write)
+        response = middleware(self.request(method='post',
+                                           HTTP_AUTHORIZATION=TOKEN))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(
+            self.read(self.request(HTTP_AUTHORIZATION=TOKEN)),
+            DEFAULT_DB_ALIAS)
+        self.assertIn(self.read(self.request(HTTP_AUTHORIZATION='Token 1')),
+                      REPLICAS)
+        request = self.request()
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.read(request), DEFAULT_DB_ALIAS)
+        caches['state'].clear()
+        self.assertIn(self.read(self.request(HTTP_AUTHORIZATION=TOKEN)),
+                      REPLICAS)
+
+    def test_replicas_are_not_migrated(self):
+        for alias in REPLICAS:
+            self.assertIs(self.router.allow_migrate(alias, 'recipes'), False)
+        self.assertIsNone(self.router.allow_migrate(DEFAULT_DB_ALIAS,
+                                                    'recipes'))
@@ -0,0 +1,70 @@
+from .base import FoodgramAPITestCase
+
+
+class RecipeETagTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_id = self.create_recipe()
+        self.url = f'/api/recipes/{self.recipe_id}/'
+
+    def test_not_modified(self):
+        etag = self.user_client.get(self.url)['ETag']
+        response = self.user_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_patch_changes_etag(self):
+        etag = self.user_client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.author_client.patch(
+                self.url, self.recipe_data((200,), name='Новый суп'),
+                format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        response = self.user_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['name'], 'Новый суп')
+
+    def test_favorite_changes_etag(self):
+        etag = self.user_client.get(self.url)['ETag']
+        self.user_client.post(f'{self.url}favorite/')
+        response = self.user_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_invalid_pk(self):
+        self.assertEqual(self.anon_client.get('/api/recipes/abc/').status_code,
+                         404)
+        self.assertEqual(self.anon_client.get('/api/recipes/0/').status_code,
+                         404)
+
+    def assert_changes_etag(self, change):
+        etag = self.user_client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.user_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_author_rename_changes_etag(self):
+        def rename():
+            self.author.first_name = 'Новое имя'
+            self.author.save()
+        response = self.assert_changes_etag(rename)
+        self.assertEqual(response.data['author']['first_name'], 'Новое имя')
+
+    def test_tag_rename_changes_etag(self):
+        def rename():
+            self.tags[0].name = 'Новый тег'
+            self.tags[0].save()
+        response = self.assert_changes_etag(rename)
+        self.assertEqual(response.data['tags'][0]['name'], 'Новый тег')
+
+    def test_ingredient_rename_changes_etag(self):
+        def rename():
+            self.ingredients[0].name = 'Новый ингредиент'
+            self.ingredients[0].save()
+        response = self.assert_changes_etag(rename)
+        self.assertEqual(response.data['ingredients'][0]['name'],
+                         'Новый ингредиент')
@@ -0,0 +1,89 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from recipes.feed import fan_out_author, rebuild_feeds, run_in_background
+from recipes.models import FeedEntry
+from users.models import Subscriptions
+
+from .base import FoodgramAPITestCase
+
+
+class FeedTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user_client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.recipe_ids = [self.create_recipe(name=f'Суп {number}')
+                           for number in range(5)]
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.user_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pages(self):
+        self.assertEqual(self.walk('/api/recipes/feed/?limit=2'),
+                         sorted(self.recipe_ids, reverse=True))
+
+    def test_filters(self):
+        self.user_client.post(f'/api/recipes/{self.recipe_ids[1]}/favorite/')
+        self.assertEqual(
+            self.walk('/api/recipes/feed/?limit=2&is_favorited=1'),
+            [self.recipe_ids[1]])
+
+    def test_popular_author_is_read_on_demand(self):
+        with mock.patch('recipes.feed.FEED_FANOUT_MAX_FOLLOWERS', 0), \
+                mock.patch('recipes.signals.FEED_FANOUT_MAX_FOLLOWERS', 0):
+            rebuild_feeds()
+            self.assertFalse(FeedEntry.objects.exists())
+            self.assertEqual(self.walk('/api/recipes/feed/?limit=2'),
+                             sorted(self.recipe_ids, reverse=True))
+
+    def test_author_leaving_pull_set_is_fanned_out(self):
+        follower = self.create_user('follower')
+        Subscriptions.objects.create(follower=follower, following=self.author)
+        with mock.patch('recipes.feed.FEED_FANOUT_MAX_FOLLOWERS', 1), \
+                mock.patch('recipes.signals.FEED_FANOUT_MAX_FOLLOWERS', 1):
+            rebuild_feeds()
+            self.assertFalse(FeedEntry.objects.exists())
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client_for(follower).delete(
+                    f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.walk('/api/recipes/feed/'),
+                         sorted(self.recipe_ids, reverse=True))
+
+    def test_fan_out_in_batches(self):
+        followers = [self.create_user(f'follower{number}')
+                     for number in range(3)]
+        for follower in followers:
+            Subscriptions.objects.create(follower=follower,
+                                         following=self.author)
+        FeedEntry.objects.all().delete()
+        with mock.patch('recipes.feed.FEED_FANOUT_BATCH_SIZE', 2), \
+                mock.patch('recipes.feed.trim_feeds') as trim_feeds:
+            fan_out_author(self.author.id)
+        self.assertEqual(
+            [sorted(call.args[0]) for call in trim_feeds.call_args_list],
+            [sorted([self.user.id, followers[0].id]),
+             sorted([followers[1].id, followers[2].id])])
+        for follower in [self.user, *followers]:
+            self.assertEqual(sorted(FeedEntry.objects.filter(
+                user=follower).values_list('recipe_id', flat=True)),
+                sorted(self.recipe_ids))
+
+    def test_fan_out_runs_in_background(self):
+        with override_settings(FEED_FANOUT_BACKGROUND=True), \
+                mock.patch('recipes.feed.executor') as executor:
+            recipe_id = self.create_recipe(name='Каша')
+        self.assertFalse(FeedEntry.objects.filter(
+            recipe_id=recipe_id).exists())
+        runner, function, *args = executor.submit.call_args.args
+        self.assertIs(runner, run_in_background)
+        function(*args)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, recipe_id=recipe_id).exists())
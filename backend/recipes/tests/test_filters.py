@@ -0,0 +1,49 @@
+from recipes.models import Tag
+
+from .base import FoodgramAPITestCase
+
+
+class RecipeFilterTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        first, second = (tag.id for tag in self.tags)
+        self.both = self.create_recipe(name='Суп', tags=[first, second])
+        self.first = self.create_recipe(name='Каша', tags=[first])
+        self.second = self.create_recipe(name='Плов', tags=[second])
+
+    def get(self, **params):
+        return self.anon_client.get('/api/recipes/', params)
+
+    def ids(self, **params):
+        response = self.get(**params)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_multiple_tags_without_duplicates(self):
+        response = self.get(tags=['tag0', 'tag1'])
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.second, self.first, self.both])
+        self.assertEqual(self.ids(tags=['tag1']), [self.second, self.both])
+
+    def test_unknown_tag_rejected(self):
+        self.assertEqual(self.get(tags=['missing']).status_code, 400)
+
+    def test_new_tag_accepted(self):
+        self.assertEqual(self.get(tags=['new']).status_code, 400)
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Новый', color='#000010', slug='new')
+        self.assertEqual(self.ids(tags=['new']), [])
+
+    def test_author(self):
+        self.assertEqual(self.ids(author=self.author.id),
+                         [self.second, self.first, self.both])
+        self.assertEqual(self.ids(author=self.user.id), [])
+
+    def test_unknown_author_returns_empty_list(self):
+        response = self.get(author=10 ** 6)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+        self.assertEqual(response.data['results'], [])
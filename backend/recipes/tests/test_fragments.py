@@ -0,0 +1,53 @@
+from unittest import mock
+
+from recipes.fragments import get_stats
+from recipes.serializers import RecipeSerializer
+
+from .base import FoodgramAPITestCase
+
+
+class RecipeFragmentsTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_ids = [self.create_recipe(name=f'Суп {number}')
+                           for number in range(3)]
+
+    def get_list(self):
+        with mock.patch.object(
+                RecipeSerializer, 'build_fragments', autospec=True,
+                side_effect=RecipeSerializer.build_fragments) as build:
+            response = self.user_client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        built = [recipe.id for call in build.call_args_list
+                 for recipe in call.args[1]]
+        return response.data['results'], built
+
+    def test_hit_skips_build(self):
+        cold, built = self.get_list()
+        self.assertEqual(sorted(built), sorted(self.recipe_ids))
+        stats = get_stats()
+        warm, built = self.get_list()
+        self.assertEqual(built, [])
+        self.assertEqual(warm, cold)
+        self.assertEqual(get_stats()['hits'], stats['hits'] + 3)
+        self.assertEqual(get_stats()['misses'], stats['misses'])
+
+    def test_edit_rebuilds_only_edited_recipe(self):
+        self.get_list()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author_client.patch(
+                f'/api/recipes/{self.recipe_ids[0]}/',
+                self.recipe_data((100,), name='Новый суп'), format='json')
+        results, built = self.get_list()
+        self.assertEqual(built, [self.recipe_ids[0]])
+        self.assertIn('Новый суп', [recipe['name'] for recipe in results])
+
+    def test_viewer_fields_not_cached(self):
+        self.get_list()
+        self.user_client.post(f'/api/recipes/{self.recipe_ids[1]}/favorite/')
+        results, built = self.get_list()
+        self.assertEqual(built, [])
+        self.assertEqual(
+            [recipe['id'] for recipe in results if recipe['is_favorited']],
+            [self.recipe_ids[1]])
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.test import override_settings
+
+from recipes.constants import IMAGE_DERIVATIVE_SIZES
+from recipes.images import (build_derivatives, build_derivatives_in_background,
+                            derivative_name)
+from recipes.models import Recipe
+
+from .base import FoodgramAPITestCase
+
+
+class ImageDerivativesTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_id = self.create_recipe()
+        self.image = Recipe.objects.get(id=self.recipe_id).image.name
+
+    def test_names_keep_extension(self):
+        for size in IMAGE_DERIVATIVE_SIZES:
+            self.assertNotEqual(
+                derivative_name('recipes/images/temp.png', size),
+                derivative_name('recipes/images/temp.jpg', size))
+
+    def test_build(self):
+        build_derivatives(self.recipe_id, self.image)
+        recipe = Recipe.objects.get(id=self.recipe_id)
+        self.assertEqual(recipe.image_derivatives_of, self.image)
+        for size in IMAGE_DERIVATIVE_SIZES:
+            self.assertTrue(default_storage.exists(
+                derivative_name(self.image, size)))
+
+    def test_build_refreshes_cached_list(self):
+        self.anon_client.get('/api/recipes/')
+        build_derivatives(self.recipe_id, self.image)
+        recipe, = self.anon_client.get('/api/recipes/').data['results']
+        self.assertTrue(recipe['image_thumbnail'].endswith(
+            derivative_name(self.image, 'thumbnail')))
+
+    def test_background_build_scheduled_on_commit(self):
+        with mock.patch('recipes.images.executor') as executor:
+            self.create_recipe()
+            executor.submit.assert_not_called()
+            with override_settings(IMAGE_DERIVATIVES_BACKGROUND=True):
+                recipe_id = self.create_recipe()
+        name = Recipe.objects.get(id=recipe_id).image.name
+        executor.submit.assert_called_once_with(
+            build_derivatives_in_background, recipe_id, name)
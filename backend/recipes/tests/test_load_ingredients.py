@@ -0,0 +1,44 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+
+from recipes.models import Ingredient
+
+from .base import FoodgramAPITestCase
+
+
+class LoadIngredientsTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'ingredients.json'
+        self.path.write_text(json.dumps([
+            {'name': 'Соль', 'measurement_unit': 'г'},
+            {'name': ' Соль ', 'measurement_unit': 'г'},
+            {'name': 'Соль', 'measurement_unit': 'щепотка'},
+            {'name': self.ingredients[0].name,
+             'measurement_unit': self.ingredients[0].measurement_unit},
+            {'name': '', 'measurement_unit': 'г'},
+        ]), encoding='utf-8')
+
+    def load(self):
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('load_ingredients', str(self.path), stdout=out)
+        return out.getvalue()
+
+    def test_repeat_run_is_idempotent(self):
+        self.assertIn('Добавлено: 2, уже в базе: 1, пропущено: 2',
+                      self.load())
+        names = list(Ingredient.objects.order_by(
+            'id').values_list('name', 'measurement_unit'))
+        self.assertIn('Добавлено: 0, уже в базе: 3, пропущено: 2',
+                      self.load())
+        self.assertEqual(list(Ingredient.objects.order_by(
+            'id').values_list('name', 'measurement_unit')), names)
+        self.assertEqual(Ingredient.objects.filter(name='Соль').count(), 2)
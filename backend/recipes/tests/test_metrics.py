@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import override_settings
+
+from backend.metrics import (DEAD_WORKERS_FILE, mark_process_dead,
+                             read_snapshot, registry)
+
+from .base import FoodgramAPITestCase
+
+# Заведомо больше pid_max: такого процесса не бывает.
+DEAD_PID = 2 ** 23
+REQUESTS = 'foodgram_http_requests_total'
+LABELS = [['route', 'old'], ['method', 'GET'], ['status', 200]]
+SAMPLE = 'foodgram_http_requests_total{route="old",method="GET",status="200"}'
+
+
+class MetricsTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings = override_settings(METRICS_DIR=directory.name,
+                                     METRICS_TOKEN='secret')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = mock.patch.object(registry, 'path', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_worker(self, pid, started, value):
+        path = self.directory / f'{pid}-{started}.json'
+        path.write_text(json.dumps({
+            'counters': [[REQUESTS, LABELS, value]], 'histograms': []}))
+        return path
+
+    def scrape(self):
+        response = self.anon_client.get(
+            '/api/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode().splitlines()
+
+    def test_token_required(self):
+        self.assertEqual(self.anon_client.get('/api/metrics').status_code,
+                         403)
+        response = self.anon_client.get(
+            '/api/metrics', HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        with override_settings(METRICS_TOKEN=''):
+            response = self.anon_client.get(
+                '/api/metrics', HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
+
+    def test_prometheus_format(self):
+        self.anon_client.get('/api/tags/')
+        response = self.anon_client.get(
+            '/api/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        lines = response.content.decode().splitlines()
+        self.assertIn(f'# TYPE {REQUESTS} counter', lines)
+        self.assertTrue(any(line.startswith(
+            f'{REQUESTS}{{route="tags-list",method="GET",status="200"}} ')
+            for line in lines))
+        self.assertIn('# TYPE foodgram_http_request_duration_seconds '
+                      'histogram', lines)
+        self.assertTrue(any(line.startswith(
+            'foodgram_http_request_duration_seconds_bucket'
+            '{route="tags-list",method="GET",le="+Inf"} ')
+            for line in lines))
+
+    def test_dead_worker_files_merged_once(self):
+        first = self.write_worker(DEAD_PID, 1, 2)
+        second = self.write_worker(DEAD_PID, 2, 3)
+        self.assertIn(f'{SAMPLE} 5', self.scrape())
+        self.assertFalse(first.exists())
+        self.assertFalse(second.exists())
+        self.assertTrue((self.directory / DEAD_WORKERS_FILE).exists())
+        self.assertIn(f'{SAMPLE} 5', self.scrape())
+        self.write_worker(DEAD_PID, 3, 4)
+        self.assertIn(f'{SAMPLE} 9', self.scrape())
+
+    def test_only_newest_file_of_live_pid_kept(self):
+        pid = os.getppid()
+        old = self.write_worker(pid, 1, 2)
+        new = self.write_worker(pid, 2, 3)
+        self.assertIn(f'{SAMPLE} 5', self.scrape())
+        self.assertFalse(old.exists())
+        self.assertTrue(new.exists())
+
+    def test_child_exit_merges_worker(self):
+        path = self.write_worker(os.getppid(), 1, 2)
+        mark_process_dead(os.getppid())
+        self.assertFalse(path.exists())
+        archive = read_snapshot(self.directory / DEAD_WORKERS_FILE)
+        self.assertEqual(archive['counters'], [[REQUESTS, LABELS, 2]])
@@ -0,0 +1,32 @@
+from .base import FoodgramAPITestCase
+
+
+class RecipeCursorPaginationTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_ids = [self.create_recipe(name=f'Суп {number}',
+                                              cooking_time=5)
+                           for number in range(5)]
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.anon_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_walk_all_pages(self):
+        self.assertEqual(self.walk('/api/recipes/?cursor=&limit=2'),
+                         sorted(self.recipe_ids, reverse=True))
+        self.assertEqual(
+            self.walk('/api/recipes/?cursor=&limit=2&ordering=id'),
+            sorted(self.recipe_ids))
+
+    def test_unknown_ordering_falls_back_to_id(self):
+        self.assertEqual(
+            self.walk('/api/recipes/?cursor=&limit=2&ordering=cooking_time'),
+            sorted(self.recipe_ids, reverse=True))
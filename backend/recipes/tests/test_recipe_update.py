@@ -0,0 +1,51 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import IngredientRecipe
+
+from .base import FoodgramAPITestCase
+
+TABLE = IngredientRecipe._meta.db_table
+WRITE = re.compile(rf'^(INSERT INTO|UPDATE|DELETE FROM) "?{TABLE}"?\s')
+
+
+class RecipeUpdateTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_id = self.create_recipe((100, 200, 300))
+        self.rows = self.get_rows()
+
+    def get_rows(self):
+        return {row.ingredient_id: row for row in IngredientRecipe.objects.
+                filter(recipe_id=self.recipe_id)}
+
+    def patch(self, amounts):
+        with CaptureQueriesContext(connection) as context:
+            response = self.author_client.patch(
+                f'/api/recipes/{self.recipe_id}/',
+                self.recipe_data(amounts), format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [query['sql'].split()[0] for query in context.captured_queries
+                if WRITE.match(query['sql'])]
+
+    def test_only_changed_rows_written(self):
+        writes = self.patch((100, 250, 0, 400))
+        self.assertEqual(sorted(writes), ['DELETE', 'INSERT', 'UPDATE'])
+        rows = self.get_rows()
+        first, second, third, fourth = self.ingredients
+        self.assertEqual(set(rows), {first.id, second.id, fourth.id})
+        self.assertEqual(rows[first.id].id, self.rows[first.id].id)
+        self.assertEqual(rows[second.id].id, self.rows[second.id].id)
+        self.assertEqual(rows[second.id].amount, 250)
+        self.assertEqual(rows[fourth.id].amount, 400)
+
+    def test_unchanged_ingredients_not_written(self):
+        self.assertEqual(self.patch((100, 200, 300)), [])
+        self.assertEqual(
+            {ingredient_id: (row.id, row.amount)
+             for ingredient_id, row in self.get_rows().items()},
+            {ingredient_id: (row.id, row.amount)
+             for ingredient_id, row in self.rows.items()})
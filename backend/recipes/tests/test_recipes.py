@@ -0,0 +1,57 @@
+from django.core.cache import caches
+
+from recipes.models import Favorite, ShoppingCart
+
+from .base import FoodgramAPITestCase
+
+
+class RecipeListTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_ids = [self.create_recipe(name=f'Суп {number}')
+                           for number in range(3)]
+        Favorite.objects.create(user=self.user, recipe_id=self.recipe_ids[0])
+        ShoppingCart.objects.create(user=self.user,
+                                    recipe_id=self.recipe_ids[1])
+
+    def get_flags(self, client):
+        response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id']: (recipe['is_favorited'],
+                               recipe['is_in_shopping_cart'])
+                for recipe in response.data['results']}
+
+    def test_flags_for_user(self):
+        self.assertEqual(self.get_flags(self.user_client), {
+            self.recipe_ids[0]: (True, False),
+            self.recipe_ids[1]: (False, True),
+            self.recipe_ids[2]: (False, False),
+        })
+
+    def test_flags_for_anonymous(self):
+        self.assertEqual(set(self.get_flags(self.anon_client).values()),
+                         {(False, False)})
+
+    def test_ingredients_in_list(self):
+        response = self.anon_client.get('/api/recipes/')
+        for recipe in response.data['results']:
+            self.assertEqual(
+                [(item['id'], item['amount'])
+                 for item in recipe['ingredients']],
+                [(self.ingredients[0].id, 100)])
+
+    def test_query_count_does_not_grow_with_page(self):
+        """Холодный кеш фрагментов: count, страница, теги, ингредиенты и
+        подписки. Тёплый: теги и ингредиенты не запрашиваются."""
+        for number in range(3, 6):
+            self.create_recipe(name=f'Суп {number}')
+        self.user_client.get('/api/recipes/')
+        for limit in (2, 6):
+            caches['recipe_fragments'].clear()
+            for queries in (5, 3):
+                with self.subTest(limit=limit, queries=queries), \
+                        self.assertNumQueries(queries):
+                    response = self.user_client.get('/api/recipes/',
+                                                    {'limit': limit})
+                self.assertEqual(len(response.data['results']), limit)
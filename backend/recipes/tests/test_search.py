@@ -0,0 +1,38 @@
+from .base import FoodgramAPITestCase
+
+
+class RecipeSearchTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.borscht = self.create_recipe(name='Борщ красный',
+                                          text='Сварить свёклу')
+        self.soup = self.create_recipe(name='Суп',
+                                       text='Почти борщ, только суп')
+        self.porridge = self.create_recipe(name='Каша', text='Сварить кашу')
+
+    def search(self, query):
+        response = self.anon_client.get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_name_ranks_above_text(self):
+        self.assertEqual(self.search('борщ'), [self.borscht, self.soup])
+
+    def test_all_words_required(self):
+        self.assertEqual(self.search('Борщ суп'), [self.soup])
+        self.assertEqual(self.search('сварить'),
+                         [self.porridge, self.borscht])
+
+    def test_edit_updates_results(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.author_client.patch(
+                f'/api/recipes/{self.porridge}/',
+                self.recipe_data((100,), name='Борщ зелёный'),
+                format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.search('борщ'),
+                         [self.porridge, self.borscht, self.soup])
+
+    def test_blank_query_is_ignored(self):
+        self.assertEqual(len(self.search('  ')), 3)
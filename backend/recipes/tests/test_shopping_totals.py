@@ -0,0 +1,79 @@
+import io
+
+from django.core.management import call_command
+
+from recipes.models import ShoppingCartTotal
+
+from .base import FoodgramAPITestCase
+
+
+class ShoppingCartTotalsTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.first = self.create_recipe((100, 50), name='Суп')
+        self.second = self.create_recipe((10, 0, 5), name='Каша')
+
+    def totals(self):
+        return dict(ShoppingCartTotal.objects.filter(
+            user=self.user).values_list('ingredient_id', 'total_amount'))
+
+    def add(self, recipe_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.user_client.post(
+                f'/api/recipes/{recipe_id}/shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+
+    def test_add_and_remove(self):
+        first, second, third, _ = (ingredient.id
+                                   for ingredient in self.ingredients)
+        self.add(self.first)
+        self.add(self.second)
+        self.assertEqual(self.totals(), {first: 110, second: 50, third: 5})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_client.delete(
+                f'/api/recipes/{self.first}/shopping_cart/')
+        self.assertEqual(self.totals(), {first: 10, third: 5})
+
+    def test_recipe_changes(self):
+        first, second, third, fourth = (ingredient.id
+                                        for ingredient in self.ingredients)
+        self.add(self.first)
+        self.add(self.second)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author_client.patch(
+                f'/api/recipes/{self.first}/',
+                self.recipe_data((0, 0, 0, 7)), format='json')
+        self.assertEqual(self.totals(), {first: 10, third: 5, fourth: 7})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author_client.delete(f'/api/recipes/{self.second}/')
+        self.assertEqual(self.totals(), {fourth: 7})
+
+    def test_summary_and_download(self):
+        self.add(self.first)
+        self.add(self.second)
+        response = self.user_client.get('/api/recipes/shopping_cart/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {item['id']: item['amount'] for item in response.data},
+            self.totals())
+        response = self.user_client.get(
+            '/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn(f'{self.ingredients[0].name} - 110', content)
+
+    def test_rebuild_command_repairs_drift(self):
+        self.add(self.first)
+        ShoppingCartTotal.objects.filter(user=self.user).update(
+            total_amount=1)
+        ShoppingCartTotal.objects.create(user=self.author,
+                                         ingredient=self.ingredients[3],
+                                         total_amount=9)
+        out = io.StringIO()
+        call_command('rebuild_shopping_totals', stdout=out)
+        first, second, *_ = (ingredient.id for ingredient in self.ingredients)
+        self.assertEqual(self.totals(), {first: 100, second: 50})
+        self.assertFalse(ShoppingCartTotal.objects.filter(
+            user=self.author).exists())
+        self.assertIn('Итоги списков покупок пересчитаны', out.getvalue())
@@ -0,0 +1,25 @@
+from .base import FoodgramAPITestCase
+
+
+class SubscriptionsTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe_ids = [self.create_recipe(name=f'Суп {number}')
+                           for number in range(3)]
+
+    def test_latest_recipes(self):
+        self.user_client.post(f'/api/users/{self.author.id}/subscribe/')
+        response = self.user_client.get(
+            '/api/users/subscriptions/?recipes_limit=2')
+        self.assertEqual(response.status_code, 200)
+        author, = response.data['results']
+        self.assertEqual(author['recipes_count'], 3)
+        self.assertEqual([recipe['id'] for recipe in author['recipes']],
+                         sorted(self.recipe_ids, reverse=True)[:2])
+
+    def test_no_subscriptions(self):
+        response = self.user_client.get(
+            '/api/users/subscriptions/?recipes_limit=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
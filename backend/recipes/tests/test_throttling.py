@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from recipes.throttling import BUCKET_KEY, IPTokenBucketThrottle
+
+from .base import TEST_CACHES, FoodgramAPITestCase
+
+# Отдельная база Redis для проверки Lua-скрипта, очищается перед каждым
+# тестом, например redis://127.0.0.1:6379/15.
+TEST_REDIS_URL = os.getenv('TEST_REDIS_URL')
+BUCKET = BUCKET_KEY.format(scope='ingredient_search', kind='ip',
+                           ident='ip:10.0.0.1')
+
+
+class SlowCache:
+    """Кеш с задержкой чтения: без атомарного списания параллельные
+    запросы успевают прочитать одну и ту же корзину до её записи."""
+
+    def __getattr__(self, name):
+        return getattr(caches['state'], name)
+
+    def get(self, *args):
+        value = caches['state'].get(*args)
+        time.sleep(0.01)
+        return value
+
+
+RATES = {'ingredient_search': '2/min', 'ingredient_search_ip': '2/min'}
+
+
+class ThrottlingTests(FoodgramAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        rest_framework = {**settings.REST_FRAMEWORK,
+                          'DEFAULT_THROTTLE_RATES': RATES}
+        override = override_settings(REST_FRAMEWORK=rest_framework)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def search(self, address):
+        return self.anon_client.get('/api/ingredients/?name=Инг',
+                                    HTTP_X_FORWARDED_FOR=address)
+
+    def test_bucket_per_forwarded_address(self):
+        for _ in range(2):
+            self.assertEqual(self.search('10.0.0.1').status_code, 200)
+        response = self.search('10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.search('10.0.0.2').status_code, 200)
+
+    def test_spoofed_forwarded_address(self):
+        for address in ('1.1.1.1, 10.0.0.1', '2.2.2.2, 10.0.0.1'):
+            self.assertEqual(self.search(address).status_code, 200)
+        self.assertEqual(self.search('3.3.3.3, 10.0.0.1').status_code, 429)
+
+    def allow(self):
+        request = APIRequestFactory().get('/api/ingredients/',
+                                          REMOTE_ADDR='10.0.0.1')
+        view = mock.Mock(action='list',
+                         throttle_scopes={'list': 'ingredient_search'})
+        throttle = IPTokenBucketThrottle()
+        return throttle, throttle.allow_request(request, view)
+
+    def race(self, count=10):
+        allowed = []
+        barrier = threading.Barrier(count)
+
+        def worker():
+            barrier.wait()
+            allowed.append(self.allow()[1])
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return allowed
+
+    def test_concurrent_requests_share_bucket(self):
+        with mock.patch('recipes.throttling.bucket_cache', SlowCache):
+            allowed = self.race()
+        self.assertEqual(allowed.count(True), 2)
+
+    def test_retry_after(self):
+        for _ in range(2):
+            self.assertTrue(self.allow()[1])
+        throttle, allowed = self.allow()
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 30, delta=1)
+
+
+@unittest.skipUnless(TEST_REDIS_URL, 'TEST_REDIS_URL не задан')
+class RedisThrottlingTests(ThrottlingTests):
+    """Те же проверки на Redis: токен списывает Lua-скрипт."""
+
+    def setUp(self):
+        caches_override = override_settings(CACHES={**TEST_CACHES, 'state': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': TEST_REDIS_URL,
+            'KEY_PREFIX': 'foodgram-tests',
+        }})
+        caches_override.enable()
+        self.addCleanup(caches_override.disable)
+        super().setUp()
+
+    def test_concurrent_requests_share_bucket(self):
+        self.assertEqual(self.race(20).count(True), 2)
+        self.assertLessEqual(caches['state'].ttl(BUCKET), 60)
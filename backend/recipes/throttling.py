@@ -0,0 +1,126 @@
+import threading
+import time
+
+from django.core.cache import caches
+from django_redis.cache import RedisCache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from backend.metrics import registry
+
+BUCKET_KEY = 'throttle:{scope}:{kind}:{ident}'
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+# Чтение, пополнение и списание токена одной командой Redis.
+TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+if tokens < 1 then
+    return {0, tostring(tokens)}
+end
+tokens = tokens - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {1, tostring(tokens)}
+"""
+
+local_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def bucket_cache():
+    return caches['state']
+
+
+def take_token(key, capacity, refill, period):
+    """Списывает токен из корзины и возвращает (разрешено, остаток).
+    В Redis корзина обновляется Lua-скриптом атомарно для всех воркеров.
+    Кеш в памяти виден только своему процессу, для него хватает
+    блокировки процесса."""
+    cache = bucket_cache()
+    now = time.time()
+    if isinstance(cache, RedisCache):
+        client = cache.client.get_client(write=True)
+        allowed, tokens = client.register_script(TAKE_TOKEN_SCRIPT)(
+            keys=[cache.make_key(key)],
+            args=[capacity, refill, repr(now), period])
+        return bool(allowed), float(tokens)
+    with local_lock:
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + max(0, now - updated) * refill)
+        if tokens < 1:
+            return False, tokens
+        cache.set(key, (tokens - 1, now), period)
+        return True, tokens - 1
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Корзина токенов на действие представления. Ёмкость и скорость
+    пополнения задаются ставкой из DEFAULT_THROTTLE_RATES: '30/min' –
+    до 30 запросов подряд, затем по одному каждые 2 секунды. Действия
+    без записи в throttle_scopes представления не ограничиваются.
+    Корзины хранятся в кеше 'state' и видны всем воркерам, токен
+    списывается атомарно, поэтому параллельные запросы не потратят
+    один и тот же токен."""
+    kind = None
+    retry_after = None
+
+    def get_scope(self, view):
+        scopes = getattr(view, 'throttle_scopes', {})
+        return scopes.get(getattr(view, 'action', None))
+
+    def get_rate_for(self, scope):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        rate = self.get_rate_for(scope) if scope else None
+        if rate is None:
+            return True
+        capacity, period = parse_rate(rate)
+        refill = capacity / period
+        ident = self.get_ident_for(request)
+        key = BUCKET_KEY.format(scope=scope, kind=self.kind, ident=ident)
+        allowed, tokens = take_token(key, capacity, refill, period)
+        if not allowed:
+            return self.throttle(scope, (1 - tokens) / refill)
+        return True
+
+    def throttle(self, scope, retry_after):
+        self.retry_after = retry_after
+        registry.inc('foodgram_throttled_requests_total',
+                     (('scope', scope), ('kind', self.kind)))
+        return False
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Корзина пользователя, для анонимных запросов – корзина IP."""
+    kind = 'user'
+
+    def get_ident_for(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Общая корзина адреса, ставка берётся из '<scope>_ip'. Не даёт
+    обойти ограничение, заведя несколько учётных записей."""
+    kind = 'ip'
+
+    def get_rate_for(self, scope):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_ip')
+
+    def get_ident_for(self, request):
+        return f'ip:{self.get_ident(request)}'
@@ -1,11 +1,22 @@
+from django.urls import path
 from rest_framework import routers
 
-from recipes.views import (FoodgramUserViewSet, IngredientViewSet,
-                           RecipeViewSet, TagViewSet)
-
+from recipes.views import (FoodgramTokenObtainPairView,
+                           FoodgramTokenRefreshView, FoodgramTokenVerifyView,
+                           FoodgramUserViewSet, IngredientViewSet,
+                           RecipeViewSet, TagViewSet, TokenRevokeView)
 
 router = routers.DefaultRouter()
 router.register(r'recipes', RecipeViewSet, basename='recipes')
 router.register(r'tags', TagViewSet, basename='tags')
 router.register(r'ingredients', IngredientViewSet)
 router.register(r'users', FoodgramUserViewSet)
+
+jwt_urls = [
+    path('jwt/create/', FoodgramTokenObtainPairView.as_view(),
+         name='jwt-create'),
+    path('jwt/refresh/', FoodgramTokenRefreshView.as_view(),
+         name='jwt-refresh'),
+    path('jwt/verify/', FoodgramTokenVerifyView.as_view(), name='jwt-verify'),
+    path('jwt/logout/', TokenRevokeView.as_view(), name='jwt-logout'),
+]
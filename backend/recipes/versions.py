@@ -0,0 +1,24 @@
+from uuid import uuid4
+
+from django.core.cache import caches
+
+
+def state_cache():
+    """Версии хранятся в Redis без вытеснения: потерянная версия
+    сбрасывает все зависящие от неё кеши."""
+    return caches['state']
+
+
+def get_version(key):
+    return state_cache().get_or_set(key, lambda: uuid4().hex, timeout=None)
+
+
+def get_versions(keys):
+    versions = state_cache().get_many(keys)
+    for key in set(keys) - versions.keys():
+        versions[key] = get_version(key)
+    return versions
+
+
+def bump_versions(*keys):
+    state_cache().delete_many(keys)
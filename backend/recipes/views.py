@@ -1,39 +1,122 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.shortcuts import HttpResponse, get_object_or_404
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.views import (TokenObtainPairView,
+                                            TokenRefreshView, TokenVerifyView)
 
 from users.models import Subscriptions
 
-from .filters import IngredientFilter, RecipeFilter
-from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                     ShoppingCart, Tag)
+from .authentication import revoke_token
+from .bulk import ADDED, EXISTS, FORBIDDEN, NOT_FOUND, add_links
+from .constants import (INGREDIENT_VERSION_KEY, SHOPPING_CART_FILENAME,
+                        TAG_VERSION_KEY)
+from .counters import count_of
+from .feed import add_authors_to_feed, read_feed
+from .filters import RecipeFilter
+from .fragments import get_fragment_versions
+from .ingredient_index import ingredient_index
+from .loaders import SubscriptionLoader
+from .mixins import ConditionalListMixin
+from .models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                     ShoppingCartTotal, Tag)
+from .pagination import (FeedPagination, PageLimitPagination,
+                         RecipeCursorPagination)
 from .permissions import IsAdminAuthorModeratorAnonimorOrReadOnly
-from .serializers import (FavoriteSerializer, FoodgramUserSerializer,
-                          IngredientSerializer, RecipeSerializer,
-                          ShoppigCartSerializer, SubscriptionsPostSerializer,
-                          SubscriptionsSerializer, TagSerializer)
+from .renderers import CSVRenderer, PlainTextRenderer
+from .serializers import (BulkIdsSerializer, FavoriteSerializer,
+                          FoodgramTokenObtainPairSerializer,
+                          FoodgramTokenRefreshSerializer,
+                          FoodgramTokenVerifySerializer,
+                          FoodgramUserSerializer, IngredientSerializer,
+                          RecipeSerializer, ShoppigCartSerializer,
+                          ShoppingCartTotalSerializer,
+                          SubscriptionsPostSerializer, SubscriptionsSerializer,
+                          TagSerializer, TokenRevokeSerializer)
+from .shopping_cart import (add_to_totals, invalidate_carts,
+                            stream_shopping_cart)
 
 User = get_user_model()
 
 
+def get_bulk_ids(request):
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
+
+
+def bulk_response(data):
+    return Response(data, status=(status.HTTP_201_CREATED
+                                  if data['summary'][ADDED]
+                                  else status.HTTP_200_OK))
+
+
 class RecipeViewSet(viewsets.ModelViewSet):
+    read_from_replica = True
     serializer_class = RecipeSerializer
     permission_classes = (IsAdminAuthorModeratorAnonimorOrReadOnly, )
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     http_method_names = ['get', 'post', 'patch', 'delete']
+    throttle_scopes = {
+        'create': 'recipe_write',
+        'partial_update': 'recipe_write',
+        'download_shopping_cart': 'shopping_cart_download',
+    }
+
+    @property
+    def pagination_class(self):
+        if RecipeCursorPagination.cursor_query_param in (
+                self.request.query_params):
+            return RecipeCursorPagination
+        return PageLimitPagination
 
     def get_queryset(self):
-        if 'limit' in self.request.query_params:
-            limit = int(self.request.query_params['limit'])
-            return Recipe.objects.all().order_by('-id')[0:limit]
-        return Recipe.objects.all()
+        return Recipe.objects.with_user_flags(
+            self.request.user
+        ).select_related('author').only(
+            'id', 'name', 'image', 'image_derivatives_of', 'text',
+            'cooking_time', 'updated_at', 'author__id', 'author__email',
+            'author__username', 'author__first_name', 'author__last_name'
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """ETag строится из тех же версий, что и ключ кеша фрагментов,
+        поэтому меняется и при правке автора, тега или ингредиента.
+        Last-Modified не отдаётся: по времени правки рецепта такие
+        изменения не видны."""
+        state = get_object_or_404(
+            Recipe.objects.with_user_flags(request.user).values(
+                'id', 'author_id', 'favorited', 'in_shopping_cart'),
+            pk=kwargs['pk']
+        )
+        is_subscribed = SubscriptionLoader.for_request(request).load(
+            state['author_id'])
+        versions = get_fragment_versions(
+            [(state['id'], state['author_id'])])[state['id']]
+        etag = quote_etag(
+            f'{state["id"]}-{versions}-'
+            f'{state["favorited"]:d}{state["in_shopping_cart"]:d}'
+            f'{is_subscribed:d}'
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Authorization',))
+        return response
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -41,6 +124,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False, methods=['get', ],
+            permission_classes=[IsAuthenticated, ])
+    def feed(self, request):
+        paginator = FeedPagination()
+        recipes = self.filter_queryset(Recipe.objects.all())
+        recipe_ids = paginator.paginate_ids(
+            request, lambda before, limit: read_feed(
+                request.user, recipes, before, limit))
+        page = list(self.get_queryset().filter(
+            id__in=recipe_ids).order_by('-id'))
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['post', ],
             permission_classes=[IsAuthenticated, ])
     def favorite(self, request, pk):
@@ -53,6 +149,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
                                              context={'request': request})
         return Response(serializer_recipe.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post', ], url_path='favorite',
+            permission_classes=[IsAuthenticated, ])
+    def favorite_bulk(self, request):
+        with transaction.atomic():
+            data, added_ids = add_links(
+                Favorite, 'user', 'recipe', request.user, Recipe.objects,
+                get_bulk_ids(request), {
+                    NOT_FOUND: 'Такой рецепт не существует!',
+                    EXISTS: 'Этот рецепт уже в избранном!',
+                })
+            if added_ids:
+                Recipe.objects.filter(id__in=added_ids).update(
+                    favorites_count=count_of(Favorite, 'recipe'))
+        return bulk_response(data)
+
     @favorite.mapping.delete
     def delete_favorite(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
@@ -71,11 +182,37 @@ class RecipeViewSet(viewsets.ModelViewSet):
             data={'user': request.user.id, 'recipe': pk},
             context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
         serializer_recipe = RecipeSerializer(Recipe.objects.get(id=pk),
                                              context={'request': request})
         return Response(serializer_recipe.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post', ], url_path='shopping_cart',
+            permission_classes=[IsAuthenticated, ])
+    def shopping_cart_bulk(self, request):
+        with transaction.atomic():
+            data, added_ids = add_links(
+                ShoppingCart, 'user', 'recipe', request.user,
+                Recipe.objects, get_bulk_ids(request), {
+                    NOT_FOUND: 'Такой рецепт не существует!',
+                    EXISTS: 'Этот рецепт уже в покупках!',
+                })
+            if added_ids:
+                add_to_totals(ShoppingCart.objects.filter(
+                    user=request.user, recipe_id__in=added_ids))
+                transaction.on_commit(
+                    lambda: invalidate_carts([request.user.id]))
+        return bulk_response(data)
+
+    @action(detail=False, methods=['get'], url_path='shopping_cart/summary',
+            permission_classes=[IsAuthenticated, ])
+    def shopping_cart_summary(self, request):
+        totals = ShoppingCartTotal.objects.filter(
+            user=request.user
+        ).select_related('ingredient').order_by('ingredient__name')
+        return Response(ShoppingCartTotalSerializer(totals, many=True).data)
+
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
@@ -88,56 +225,51 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'],
-            permission_classes=[IsAuthenticated, ])
+            permission_classes=[IsAuthenticated, ],
+            renderer_classes=[PlainTextRenderer, CSVRenderer, JSONRenderer])
     def download_shopping_cart(self, request):
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__carts__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).order_by(
-            'ingredient__name'
-        ).annotate(ingredient_amount=Sum('amount'))
-        shopping_list = ['Список покупок:\n']
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['ingredient_amount']
-            shopping_list.append(f'\n{name} - {amount}, {unit}')
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = \
-            'attachment; filename="shopping_cart.txt"'
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            stream_shopping_cart(request.user, renderer.format),
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{SHOPPING_CART_FILENAME}.'
+            f'{renderer.format}"'
+        )
         return response
 
 
 class FoodgramUserViewSet(UserViewSet):
+    read_from_replica = True
     queryset = User.objects.all()
     serializer_class = FoodgramUserSerializer
     http_method_names = ['get', 'post', 'patch', 'delete']
     permission_classes = (AllowAny, )
 
+    def prefetch_latest_recipes(self, authors):
+        recipes = Recipe.objects.only('id', 'name', 'image',
+                                      'cooking_time', 'author')
+        limit = self.request.query_params.get('recipes_limit', '')
+        if limit.isdigit():
+            recipes = recipes.latest_per_author(
+                [author.id for author in authors], int(limit))
+        prefetch_related_objects(
+            authors,
+            Prefetch('recipes', queryset=recipes, to_attr='latest_recipes')
+        )
+
     @action(detail=False, methods=['get', ],
             permission_classes=(IsAuthenticated,)
             )
     def subscriptions(self, request):
         page = self.paginate_queryset(User.objects.filter(
             following__follower=request.user))
+        self.prefetch_latest_recipes(page)
         serializer = SubscriptionsSerializer(
             page,
             context={'request': request},
             many=True)
-
-        if 'recipes_limit' in request.query_params:
-            limit = int(request.query_params['recipes_limit']) + 1
-            for data in serializer.data:
-                user = User.objects.get(username=data['username'])
-                recipes = user.recipes.all().order_by('-id')[1:limit]
-                if recipes.count() > 1:
-                    serializer2 = RecipeSerializer(
-                        recipes,
-                        context={'request': request},
-                        many=True
-                    )
-                    data['recipes'] = serializer2.data
         return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post', ],
@@ -150,19 +282,30 @@ class FoodgramUserViewSet(UserViewSet):
             context={'request': request})
         serializer_subspript.is_valid(raise_exception=True)
         serializer_subspript.save()
+        self.prefetch_latest_recipes([user])
         serializer_user = SubscriptionsSerializer(user,
                                                   context={'request': request})
-        if 'recipes_limit' in request.query_params:
-            limit = int(request.query_params['recipes_limit']) + 1
-            recipes = user.recipes.all().order_by('-id')[1:limit]
-            serializer_recipe = RecipeSerializer(recipes,
-                                                 context={'request': request},
-                                                 many=True)
-            serializer_user.data['recipes'].clear()
-            serializer_user.data['recipes'].extend(
-                list(serializer_recipe.data))
         return Response(serializer_user.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post', ], url_path='subscribe',
+            permission_classes=(IsAuthenticated,))
+    def subscribe_bulk(self, request):
+        with transaction.atomic():
+            data, added_ids = add_links(
+                Subscriptions, 'follower', 'following', request.user,
+                User.objects, get_bulk_ids(request), {
+                    NOT_FOUND: 'Такого пользователя не существует!',
+                    EXISTS: 'Вы уже подписаны!',
+                    FORBIDDEN: 'Нельзя подписаться на себя!',
+                }, forbidden_ids={request.user.id})
+            if added_ids:
+                authors = User.objects.filter(id__in=added_ids)
+                authors.update(
+                    followers_count=count_of(Subscriptions, 'following'))
+                add_authors_to_feed(request.user.id, authors.only(
+                    'id', 'followers_count'))
+        return bulk_response(data)
+
     @subscribe.mapping.delete
     def delete_subscribe(self, request, id):
         author = get_object_or_404(User, id=id)
@@ -183,17 +326,50 @@ class FoodgramUserViewSet(UserViewSet):
         return Response(serializer.data)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalListMixin, viewsets.ReadOnlyModelViewSet):
+    read_from_replica = True
+    version_key = TAG_VERSION_KEY
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (AllowAny, )
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalListMixin, viewsets.ReadOnlyModelViewSet):
+    read_from_replica = True
+    version_key = INGREDIENT_VERSION_KEY
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     permission_classes = (AllowAny, )
-    filter_backends = (DjangoFilterBackend, )
-    filterset_class = IngredientFilter
+    throttle_scopes = {'list': 'ingredient_search'}
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(name))
+
+
+class FoodgramTokenObtainPairView(TokenObtainPairView):
+    serializer_class = FoodgramTokenObtainPairSerializer
+
+
+class FoodgramTokenRefreshView(TokenRefreshView):
+    serializer_class = FoodgramTokenRefreshSerializer
+
+
+class FoodgramTokenVerifyView(TokenVerifyView):
+    serializer_class = FoodgramTokenVerifySerializer
+
+
+class TokenRevokeView(APIView):
+    permission_classes = (AllowAny, )
+
+    def post(self, request):
+        serializer = TokenRevokeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        revoke_token(serializer.validated_data['refresh'])
+        if isinstance(request.auth, AccessToken):
+            revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
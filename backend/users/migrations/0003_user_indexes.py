@@ -0,0 +1,24 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+from backend.indexes import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='foodgramuser',
+            index=models.Index(condition=models.Q(('followers_count__gt', 1000)), fields=['id'], name='user_popular_author'),
+        ),
+        AddIndexConcurrently(
+            model_name='subscriptions',
+            index=models.Index(fields=['following', 'follower'], name='subscription_following_idx'),
+        ),
+    ]
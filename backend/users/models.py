@@ -1,10 +1,11 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.db import models
 
-from .constants import (EMAIL_MAX_LENGTH, FIRST_NAME_MAX_LENGTH,
-                        LAST_NAME_MAX_LENGTH, PASSWORD_MAX_LENGTH,
-                        ROLE_MAX_LEN, ROLES, USER, ADMIN, MODERATOR,
-                        USERNAME_MAX_LENGTH)
+from recipes.constants import FEED_FANOUT_MAX_FOLLOWERS
+
+from .constants import (ADMIN, EMAIL_MAX_LENGTH, FIRST_NAME_MAX_LENGTH,
+                        LAST_NAME_MAX_LENGTH, MODERATOR, PASSWORD_MAX_LENGTH,
+                        ROLE_MAX_LEN, ROLES, USER, USERNAME_MAX_LENGTH)
 from .managers import FoodgramManager
 from .validators import validate_username
 
@@ -35,6 +36,10 @@ class FoodgramUser(AbstractBaseUser, PermissionsMixin):
     is_superuser = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    recipes_count = models.PositiveIntegerField(
+        default=0, verbose_name='Количество рецептов')
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name='Количество подписчиков')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -45,6 +50,13 @@ class FoodgramUser(AbstractBaseUser, PermissionsMixin):
         ordering = ('date_joined',)
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+        indexes = [
+            models.Index(
+                fields=['id'], name='user_popular_author',
+                condition=models.Q(
+                    followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS)
+            ),
+        ]
 
     def __str__(self):
         return self.username
@@ -73,6 +85,10 @@ class Subscriptions(models.Model):
                 name='unique_follower_following'
             )
         ]
+        indexes = [
+            models.Index(fields=['following', 'follower'],
+                         name='subscription_following_idx'),
+        ]
         verbose_name = 'Подписки'
         verbose_name_plural = 'подписки'
 